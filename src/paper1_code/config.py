@@ -29,7 +29,9 @@ if not _cfg.exists():
         cfg.write("# Location of the data used in analysis scripts\n")
         cfg.write(f'data_path = "{_data}"\n')
         cfg.write("# Location of the saved figures\n")
-        cfg.write(f'save_path = "{_save}"')
+        cfg.write(f'save_path = "{_save}"\n')
+        cfg.write("# Floating point precision of loaded fields and reductions\n")
+        cfg.write('precision = "float64"')
 
 HOME = pathlib.Path().home()
 # https://github.com/python/mypy/issues/16423
@@ -38,6 +40,15 @@ with _cfg.open(mode="rb") as cfg:  # type: ignore
     PROJECT_ROOT = pathlib.Path(out["paper1-code"]["project_root"])
     DATA_DIR_ROOT = pathlib.Path(out["paper1-code"]["data_path"])
     DATA_DIR_OUT = pathlib.Path(out["paper1-code"]["save_path"])
+    # With "float32", fields stored as float32 are kept as such through loading and
+    # reduction, and only the accumulators of the reductions use float64.
+    PRECISION: Literal["float32", "float64"] = out["paper1-code"].get(
+        "precision", "float64"
+    )
+    if PRECISION not in {"float32", "float64"}:
+        raise ValueError(
+            f'precision in {_cfg} must be "float32" or "float64", not {PRECISION!r}.'
+        )
     # data_path = "/media/een023/LaCie/een023/cesm/model-runs"
 
 # Means are found by calculating the mean of the control runs:
@@ -3,6 +3,7 @@
 from paper1_code.load import (
     b20,
     cesm2,
+    download,
     e13,
     g16,
     j05,
@@ -20,6 +21,7 @@ from paper1_code.load import (
 __all__ = [
     "b20",
     "cesm2",
+    "download",
     "e13",
     "g16",
     "j05",
@@ -7,6 +7,7 @@ import xarray as xr
 from volcano_base.load import FindFiles
 
 import paper1_code as core
+from paper1_code.utils.time_series import WindowIndex
 
 FINDER = FindFiles()
 
@@ -47,6 +48,45 @@ def get_c2w_aod_rf(
     raise ValueError("freq must be y or ses")
 
 
+def get_c2w_aod_rf_index(
+    shift: int | None = 0,
+) -> tuple[list[WindowIndex], list[WindowIndex]]:
+    """Return cumulative-sum indices of the monthly SAOD and RF arrays.
+
+    Unlike `get_c2w_aod_rf`, which resamples to annual or seasonal means, the indices
+    give the month-length weighted mean over any window of any ensemble member.
+
+    Parameters
+    ----------
+    shift : int | None
+        Passed on to `get_aod_arrs` and `get_rf_arrs`.
+
+    Returns
+    -------
+    tuple[list[WindowIndex], list[WindowIndex]]
+        The SAOD and RF indices in lists of length five, representing the simulation
+        cases "medium", "medium-plus", "strong", "size5000" and "strong-highlat". Window
+        edges are given in years after the eruption.
+
+    Examples
+    --------
+    >>> aod, rf = get_c2w_aod_rf_index()
+    >>> early = rf[0].mean(0, 1.1)
+    >>> late = rf[0].mean(1.1, 3)
+    """
+    aod = [WindowIndex(a, _days_in_month(a)) for a in get_aod_arrs(shift=shift)]
+    rf = [WindowIndex(a, _days_in_month(a)) for a in get_rf_arrs(shift=shift)]
+    return aod, rf
+
+
+def _days_in_month(arrs: list[xr.DataArray]) -> np.ndarray:
+    # After `_finalize_arrays`, each time step is labelled by the start of its month
+    # (in units of years), so month lengths are the forward differences of the time
+    # axis. The noleap calendar repeats every twelve months, which gives the last one.
+    days = np.round(np.diff(arrs[0].time.data) * 365)
+    return np.r_[days, days[-12]]
+
+
 def _finalize_arrays(
     sim_lists: tuple[
         list[xr.DataArray],
@@ -439,6 +479,76 @@ def get_trefht_arrs(
     return _finalize_arrays((m, mp, s, ss, h), shift, remove_seasonality)
 
 
+def get_aod_rf_bands(
+    sim: str = "strong-highlat",
+    bands: dict[str, tuple[float, float]] | None = None,
+) -> tuple[list[xr.Dataset], list[xr.Dataset]]:
+    """Return latitude band means and the zonal mean of SAOD and RF.
+
+    Each file is reduced once by `core.utils.time_series.zonal_band_means`. As for the
+    global means, the control RF is subtracted and both SAOD and RF are given as
+    anomalies from the mean of the last decade.
+
+    Parameters
+    ----------
+    sim : str
+        The simulation case.
+    bands : dict[str, tuple[float, float]] | None
+        The latitude bands. Default is `core.utils.time_series.LATITUDE_BANDS`, that
+        is, global, tropics and the northern and southern extratropics.
+
+    Returns
+    -------
+    tuple[list[xr.Dataset], list[xr.Dataset]]
+        The SAOD and RF of each ensemble member, as datasets with the variables
+        `band_mean` (band, time) and `zonal_mean` (time, lat).
+
+    Examples
+    --------
+    >>> aod, rf = get_aod_rf_bands()
+    >>> rf[0].band_mean.sel(band="nh-extratropics").plot()
+    >>> aod[0].zonal_mean.plot(x="time")
+    """
+    match sim:
+        case "strong-highlat":
+            ensembles = {"ens1", "ens3"}
+        case "size5000":
+            ensembles = {"ens2", "ens4"}
+        case _:
+            ensembles = {f"ens{i + 2}" for i in range(4)}
+    reduce = core.utils.time_series.zonal_band_means
+    control = (
+        FINDER.find("e_fSST1850", "ens1", "control", "h0", ["FLNT", "FSNT"])
+        .sort("attr", "ensemble")
+        .keep_most_recent()
+        .load()
+    )
+    control_rf = reduce(control[1] - control[0], bands).compute()
+    data = (
+        FINDER.find("e_fSST1850", ensembles, sim, {"AODVISstdn", "FLNT", "FSNT"}, "h0")
+        .sort("attr", "ensemble")
+        .keep_most_recent()
+    )
+    aod = [
+        _last_decade_anomaly(reduce(arr, bands).compute())
+        for arr in data.copy().keep("AODVISstdn").load()
+    ]
+    rf = []
+    for fsnt, flnt in zip(
+        data.copy().keep("FSNT").load(), data.copy().keep("FLNT").load(), strict=True
+    ):
+        net, ctrl = xr.align(reduce(fsnt - flnt, bands).compute(), control_rf)
+        net = (net - ctrl).assign_attrs(flnt.attrs, attr="RF")
+        rf.append(_last_decade_anomaly(net))
+    return aod, rf
+
+
+def _last_decade_anomaly(ds: xr.Dataset, custom_decade: int = 120) -> xr.Dataset:
+    out = ds - ds.isel(time=slice(-custom_decade, None)).mean("time")
+    time = core.utils.time_series.dt2float(out.time.data)
+    return out.assign_coords(time=time).assign_attrs(ds.attrs)
+
+
 def _c2w_ses(aod, rf) -> tuple[list[np.ndarray], list[np.ndarray], list[np.ndarray]]:
     aod = core.utils.time_series.shift_arrays(aod, custom=1)
     rf = core.utils.time_series.shift_arrays(rf, custom=1)
@@ -0,0 +1,225 @@
+"""Download the datasets that are loaded in this package.
+
+The files that should be downloaded are listed in a manifest, which is a JSON file with
+one entry per file:
+
+.. code-block:: json
+
+    [
+        {
+            "url": "https://example.org/data/file.nc",
+            "path": "cesm-lme/file.nc",
+            "sha256": "..."
+        }
+    ]
+
+where `path` is relative to the root directory the files are downloaded to (usually
+`core.config.DATA_DIR_ROOT`), and `sha256` is optional.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import pathlib
+from typing import NamedTuple, Self
+
+import requests
+import rich.progress
+
+
+class ManifestEntry(NamedTuple):
+    """A file that should be downloaded.
+
+    Attributes
+    ----------
+    url : str
+        Where the file is downloaded from.
+    path : str
+        Where the file is saved, relative to the download directory.
+    sha256 : str | None
+        The expected SHA-256 checksum of the file, if known.
+    """
+
+    url: str
+    path: str
+    sha256: str | None = None
+
+
+def read_manifest(file: pathlib.Path | str) -> list[ManifestEntry]:
+    """Read the entries of a manifest file."""
+    with open(file, encoding="utf-8") as f:
+        return [ManifestEntry(**entry) for entry in json.load(f)]
+
+
+def write_manifest(file: pathlib.Path | str, entries: list[ManifestEntry]) -> None:
+    """Write entries to a manifest file."""
+    with open(file, "w", encoding="utf-8") as f:
+        json.dump([entry._asdict() for entry in entries], f, indent=2)
+
+
+def sha256sum(file: pathlib.Path, chunk_size: int = 2**20) -> str:
+    """Return the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadManager:
+    """Download many files concurrently, resuming partial downloads.
+
+    Each file is first written to a ``.part`` file next to its destination. If a
+    download is interrupted, the next attempt asks the server for the remaining bytes
+    only (an HTTP Range request). When the file is complete, its checksum is verified
+    before it is moved into place.
+
+    Parameters
+    ----------
+    root : pathlib.Path
+        The directory the manifest paths are relative to.
+    max_workers : int
+        Number of files that are downloaded at the same time.
+    verify : bool
+        Whether to verify the TLS certificates of the servers.
+    chunk_size : int
+        Number of bytes that are read from the connection at a time.
+
+    Examples
+    --------
+    >>> manager = DownloadManager(core.config.DATA_DIR_ROOT).add(
+    ...     "https://example.org/data/file.nc", "example/file.nc"
+    ... )
+    >>> manager.download()
+    """
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        max_workers: int = 4,
+        verify: bool = True,
+        chunk_size: int = 2**20,
+    ) -> None:
+        self.root = pathlib.Path(root)
+        self.max_workers = max_workers
+        self.verify = verify
+        self.chunk_size = chunk_size
+        self.entries: list[ManifestEntry] = []
+
+    @classmethod
+    def from_manifest(
+        cls, manifest: pathlib.Path | str, root: pathlib.Path, **kwargs
+    ) -> Self:
+        """Create a manager for all files in a manifest file.
+
+        Keyword arguments are passed on to `DownloadManager`.
+        """
+        out = cls(root, **kwargs)
+        out.entries.extend(read_manifest(manifest))
+        return out
+
+    def add(self, url: str, path: str, sha256: str | None = None) -> Self:
+        """Add a file to download."""
+        self.entries.append(ManifestEntry(url, path, sha256))
+        return self
+
+    def update_manifest(self, manifest: pathlib.Path | str) -> None:
+        """Add the entries to a manifest file, with the checksums of downloaded files.
+
+        Entries without a checksum get the checksum of the downloaded file, so that
+        later downloads of the same file are verified against it. Entries already in
+        the manifest with the same path are replaced.
+        """
+        entries = (
+            {e.path: e for e in read_manifest(manifest)}
+            if pathlib.Path(manifest).exists()
+            else {}
+        )
+        for entry in self.entries:
+            file = self.root / entry.path
+            if entry.sha256 is None and file.exists():
+                entries[entry.path] = entry._replace(sha256=sha256sum(file))
+            else:
+                entries[entry.path] = entry
+        write_manifest(manifest, list(entries.values()))
+
+    def missing(self) -> list[ManifestEntry]:
+        """Return the entries that are not downloaded, or that fail the checksum."""
+        return [entry for entry in self.entries if not self._is_complete(entry)]
+
+    def _is_complete(self, entry: ManifestEntry) -> bool:
+        file = self.root / entry.path
+        if not file.exists():
+            return False
+        return entry.sha256 is None or sha256sum(file) == entry.sha256
+
+    def download(self, progress: bool = True) -> list[pathlib.Path]:
+        """Download all missing files.
+
+        Parameters
+        ----------
+        progress : bool
+            Show a progress bar per file.
+
+        Returns
+        -------
+        list[pathlib.Path]
+            The paths of all files in the manifest.
+
+        Raises
+        ------
+        ValueError
+            If a downloaded file does not match its checksum. The partial file is
+            removed, so the next attempt starts from scratch.
+        """
+        bars = rich.progress.Progress(
+            rich.progress.TextColumn("[progress.description]{task.description}"),
+            rich.progress.BarColumn(),
+            rich.progress.DownloadColumn(),
+            rich.progress.TransferSpeedColumn(),
+            rich.progress.TimeRemainingColumn(elapsed_when_finished=True),
+            disable=not progress,
+        )
+        with (
+            bars,
+            concurrent.futures.ThreadPoolExecutor(self.max_workers) as pool,
+        ):
+            futures = [
+                pool.submit(self._fetch, entry, bars) for entry in self.missing()
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        return [self.root / entry.path for entry in self.entries]
+
+    def _fetch(
+        self, entry: ManifestEntry, bars: rich.progress.Progress
+    ) -> pathlib.Path:
+        file = self.root / entry.path
+        file.parent.mkdir(parents=True, exist_ok=True)
+        part = file.with_name(f"{file.name}.part")
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        task = bars.add_task(f"[cyan]{file.name}", total=None)
+        with requests.get(
+            entry.url, headers=headers, stream=True, verify=self.verify, timeout=60
+        ) as r:
+            # 416: the partial file already holds everything the server has.
+            if r.status_code != requests.codes.range_not_satisfiable:
+                r.raise_for_status()
+                if r.status_code != requests.codes.partial_content:
+                    # The server sent the whole file.
+                    offset = 0
+                size = r.headers.get("Content-Length")
+                total = None if size is None else int(size) + offset
+                bars.update(task, total=total, completed=offset)
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        bars.advance(task, len(chunk))
+        if entry.sha256 is not None and (found := sha256sum(part)) != entry.sha256:
+            part.unlink()
+            raise ValueError(
+                f"The checksum of {file} is {found}, but {entry.sha256} was expected."
+            )
+        part.replace(file)
+        return file
@@ -7,8 +7,11 @@ See https://doi.org/10.1007/s00382-016-3055-1 for the full paper.
 The datasets were kindly provided by J. Gregory (personal communication).
 """
 
+import collections
+import concurrent.futures
 import pathlib
 import sys
+import threading
 from typing import Literal, Self
 
 import numpy as np
@@ -17,6 +20,76 @@ import xarray as xr
 import paper1_code as core
 
 
+class DatasetPool:
+    """Least recently used pool of open datasets.
+
+    The datasets are opened lazily with `xr.open_dataset`, so only the variables that
+    are used are read from disk. A file is opened again if it has changed on disk since
+    it was opened.
+
+    Datasets that are replaced or pushed out of a full pool are only dropped from the
+    pool, not closed, since callers may still use them. Their files are closed when the
+    datasets are garbage collected. `evict` is the only method that closes datasets.
+
+    Parameters
+    ----------
+    maxsize : int
+        Number of datasets that are kept in the pool. When the pool is full, the least
+        recently used dataset is dropped.
+    """
+
+    def __init__(self, maxsize: int = 16) -> None:
+        self.maxsize = maxsize
+        self._datasets: collections.OrderedDict[
+            pathlib.Path, tuple[float, xr.Dataset]
+        ] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of open datasets."""
+        return len(self._datasets)
+
+    def get(self, file: pathlib.Path | str) -> xr.Dataset:
+        """Return the open dataset of `file`, opening it if needed.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be opened.
+        """
+        file = pathlib.Path(file).resolve()
+        mtime = file.stat().st_mtime
+        with self._lock:
+            if (cached := self._datasets.get(file)) is not None and cached[0] == mtime:
+                self._datasets.move_to_end(file)
+                return cached[1]
+        ds = xr.open_dataset(file)
+        with self._lock:
+            self._datasets.pop(file, None)
+            self._datasets[file] = (mtime, ds)
+            while len(self._datasets) > self.maxsize:
+                self._datasets.popitem(last=False)
+        return ds
+
+    def evict(self, file: pathlib.Path | str | None = None) -> None:
+        """Close and remove the dataset of `file`, or all datasets if not given.
+
+        The datasets must not be used after they are closed.
+        """
+        with self._lock:
+            if file is None:
+                files = list(self._datasets)
+            else:
+                files = [pathlib.Path(file).resolve()]
+            for f in files:
+                if (cached := self._datasets.pop(f, None)) is not None:
+                    cached[1].close()
+
+
+POOL = DatasetPool()
+"""The pool of open datasets shared by all `gregory_paper` instances."""
+
+
 class _GregoryPaper:
     def __init__(self) -> None:
         self._timeseries: list[xr.DataArray] = []
@@ -55,8 +128,9 @@ class _GregoryPaper:
         return da.assign_attrs(da_attrs)
 
     def _keep_attrs(self, ds: xr.Dataset, da: xr.DataArray) -> dict:
-        ds_attrs = ds.attrs
-        da_attrs = da.attrs
+        # The datasets are shared through the pool, so their attributes are copied.
+        ds_attrs = dict(ds.attrs)
+        da_attrs = dict(da.attrs)
         common = set(da_attrs) & set(ds_attrs)
         for c in common:
             ds_attrs[f"ds_{c}"] = ds_attrs[c]
@@ -66,7 +140,7 @@ class _GregoryPaper:
 
     def _try_open(self, file: pathlib.Path | str) -> xr.Dataset | None:
         try:
-            ds = xr.open_dataset(file)
+            ds = POOL.get(file)
         except OSError:
             return None
         return ds
@@ -91,7 +165,7 @@ class _GregoryPaper:
             case _:
                 return None, None
         if isinstance(ds, xr.Dataset | xr.DataArray):
-            ds.attrs["var_name"] = var
+            ds = ds.assign_attrs(var_name=var)
         return ds, ds_var
 
     def _load_datasets(self) -> None:
@@ -142,6 +216,49 @@ class _GregoryPaper:
             )
         return self._timeseries
 
+    def load_ensemble(self, max_workers: int | None = None) -> xr.Dataset:
+        """Load the temperature of all specified ensemble members into one Dataset.
+
+        The members are opened concurrently and concatenated along a new
+        ``ensemble`` dimension, with the ensemble numbers as coordinate.
+
+        Parameters
+        ----------
+        max_workers : int | None
+            Number of members that are opened at the same time. Default is one per
+            member.
+
+        Returns
+        -------
+        xr.Dataset
+            The ``air_temperature`` of all members found on disk.
+
+        Raises
+        ------
+        AttributeError
+            If none of the specified ensemble members are found.
+        """
+        ensemble = list(getattr(self, "ensemble", self._ensemble))
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers or len(ensemble)
+        ) as pool:
+            found = [
+                (e, ds)
+                for e, (ds, _) in zip(
+                    ensemble,
+                    pool.map(lambda e: self._load_dataset("tas", e), ensemble),
+                    strict=True,
+                )
+                if ds is not None
+            ]
+        if not found:
+            raise AttributeError(
+                f"None of the ensemble members {ensemble} of tas were found."
+            )
+        members, datasets = zip(*found, strict=True)
+        out = xr.concat(datasets, dim="ensemble", combine_attrs="drop_conflicts")
+        return out.assign_coords(ensemble=list(members))
+
 
 def gregory_paper() -> _GregoryPaper:
     """Get data from the simulations done by Gregory in his 2016 paper.
@@ -6,20 +6,25 @@ See https://doi.org/10.5285/232164e8b1444978a41f2acf8bbbfe91 for access to the c
 dataset.
 """
 
+import concurrent.futures
 import datetime
+import pathlib
+import re
 
 import numpy as np
-import volcano_base
 import xarray as xr
 
 import paper1_code as core
 
+VARS = (
+    "effective_radiative_forcing",
+    "stratospheric_aerosol_optical_depth_at_550_nm",
+    "surface_temperature_adjustment",
+)
 
-def get_m20(find_all_peaks: bool = False) -> tuple[np.ndarray, ...]:
-    """Create samples from Marshall et al. 2020."""
-    # Need SAOD and RF seasonal and annual means, as well as an array of equal length
-    # with the corresponding time-after-eruption.
-    path = (
+
+def _data_path() -> pathlib.Path:
+    return (
         core.config.DATA_DIR_ROOT
         / "marshall"
         / "dap.ceda.ac.uk"
@@ -29,16 +34,25 @@ def get_m20(find_all_peaks: bool = False) -> tuple[np.ndarray, ...]:
         / "data"
         / "UM-UKCA_volcanic_ensemble"
     )
-    files = list(path.rglob("UM_UKCA*.nc"))
-    data: list[xr.Dataset] = [xr.load_dataset(file.resolve()) for file in files]
-    data = volcano_base.load.FindFiles().sort("SO2 emission (Tg)", arrays=data)
-    # We first move the July eruptions back six months to January, so all have the
-    # eruption day as the first element.
-    for i, arr in enumerate(data):
-        if arr.attrs["Eruption season"] == "Jul":
-            data[i] = arr.assign_coords(
-                time=arr.time.data - datetime.timedelta(days=180)
-            )
+
+
+def _coord_name(attr: str) -> str:
+    """Turn an attribute such as 'SO2 emission (Tg)' into 'so2_emission_tg'."""
+    return re.sub(r"\W+", "_", attr.lower()).strip("_")
+
+
+def _open_eruption(file: pathlib.Path) -> xr.Dataset:
+    """Read the variables in `VARS` of one eruption, with the eruption day first."""
+    with xr.open_dataset(file) as ds:
+        out = ds[list(VARS)].load()
+    # We move the July eruptions back six months to January, so all have the eruption
+    # day as the first element.
+    if out.attrs["Eruption season"] == "Jul":
+        out = out.assign_coords(time=out.time.data - datetime.timedelta(days=180))
+    return out
+
+
+def _check_time(data: list[xr.Dataset]) -> None:
     # Check that both seasons do indeed start at the same date.
     # Let us also check that 12 elements in, we are one year ahead.
     first = str(data[0].time.data[0])
@@ -48,36 +62,104 @@ def get_m20(find_all_peaks: bool = False) -> tuple[np.ndarray, ...]:
         if f"{str(arr.time.data[12])[:3]}0{str(arr.time.data[12])[3 + 1 :]}" != first:
             raise ValueError("This is not same day, next year.")
 
-    weighter = core.utils.time_series.weighted_season_avg
-    time, so2, aod, rf, temp = [], [], [], [], []
+
+def _cache_attrs(path: pathlib.Path, files: list[pathlib.Path]) -> dict[str, str]:
+    """Return the attributes that identify the source of a cached ensemble."""
+    return {
+        "m20_vars": ",".join(VARS),
+        "m20_files": ",".join(str(f.relative_to(path)) for f in files),
+        "m20_mtimes": ",".join(repr(f.stat().st_mtime) for f in files),
+    }
+
+
+def load_ensemble(max_workers: int | None = None, cache: bool = True) -> xr.Dataset:
+    """Load all eruptions of Marshall et al. 2020 into one Dataset.
+
+    Only the variables in `VARS` are read, and the files are read in parallel. The
+    eruptions are stacked along an ``eruption`` dimension, sorted by the SO2 emission,
+    and the file attributes become coordinates along ``eruption``. For example, the
+    attribute 'SO2 emission (Tg)' becomes the coordinate ``so2_emission_tg``.
+
+    Parameters
+    ----------
+    max_workers : int | None
+        Number of files that are read at the same time.
+    cache : bool
+        If True, read the ensemble from the cache file ``m20-ensemble.nc`` in the
+        output directory, and create it if it does not exist or was made from other
+        files or variables. If the cache cannot be written, the ensemble is returned
+        without it.
+
+    Returns
+    -------
+    xr.Dataset
+        The variables in `VARS` with dimensions ``(eruption, time)``. July eruptions
+        are moved back six months, so that time starts on the eruption day for all.
+
+    Raises
+    ------
+    ValueError
+        If the eruptions do not start on the same day.
+    """
+    path = _data_path()
+    files = sorted(path.rglob("UM_UKCA*.nc"))
+    key = _cache_attrs(path, files)
+    file = core.utils.if_save.create_savedir() / "m20-ensemble.nc"
+    if cache and file.exists():
+        out = xr.load_dataset(file)
+        if all(out.attrs.get(k) == v for k, v in key.items()):
+            return out
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+        data = list(pool.map(_open_eruption, files))
+    _check_time(data)
+    coords = {
+        _coord_name(attr): (
+            "eruption",
+            [d.attrs[attr] for d in data],
+            {"long_name": attr},
+        )
+        for attr, value in data[0].attrs.items()
+        if isinstance(value, str | int | float | np.number)
+    }
+    out = xr.concat(data, dim="eruption", combine_attrs="drop")
+    out = out.assign_coords(eruption=[f.stem for f in files], **coords)
+    out = out.isel(eruption=np.argsort(out.so2_emission_tg.data, kind="stable"))
+    out = out.assign_attrs(key)
+    if cache:
+        try:
+            out.to_netcdf(file)
+        except OSError as e:
+            file.unlink(missing_ok=True)
+            print(f"Warning: could not cache the M20 ensemble in {file}: {e}")
+    return out
+
+
+def get_m20(find_all_peaks: bool = False) -> tuple[np.ndarray, ...]:
+    """Create samples from Marshall et al. 2020."""
+    # Need SAOD and RF seasonal and annual means, as well as an array of equal length
+    # with the corresponding time-after-eruption.
+    ds = load_ensemble()
     if find_all_peaks:
-        for arr in data:
-            # Find peak using rolling mean or savgol filter, then plot SO2 versus {SAOD,
-            # ERF, T}.
-            peak_func = core.utils.time_series.find_peak
-            rf_arr = -peak_func(-arr["effective_radiative_forcing"], version="rolling")
-            temp_arr = peak_func(
-                arr["surface_temperature_adjustment"], version="rolling"
-            )
-            aod_arr = peak_func(
-                arr["stratospheric_aerosol_optical_depth_at_550_nm"], version="rolling"
-            )
-            so2.append(arr.attrs["SO2 emission (Tg)"])
-            aod.append(aod_arr)
-            rf.append(rf_arr)
-            temp.append(temp_arr)
-        return np.asarray(so2), np.asarray(aod), -np.asarray(rf), np.asarray(temp)
-    tropical_limit = 10
-    for arr in data:
-        if abs(arr.attrs["Eruption latitude (degrees N)"]) > tropical_limit:
-            continue
-        time.append(
-            core.utils.time_series.dt2float(
-                weighter(arr["effective_radiative_forcing"]).time.data,
-                days_in_year=360,
-            )
+        # Find peak using a rolling mean, then plot SO2 versus {SAOD, ERF, T}.
+        rolling = ds.rolling(time=12, center=True).mean()
+        peak = rolling.max("time")
+        # The forcing is negative, so its peak is the minimum.
+        rf = rolling["effective_radiative_forcing"].min("time")
+        return (
+            ds.so2_emission_tg.data,
+            peak["stratospheric_aerosol_optical_depth_at_550_nm"].data,
+            -rf.data,
+            peak["surface_temperature_adjustment"].data,
         )
-        aod.append(weighter(arr["stratospheric_aerosol_optical_depth_at_550_nm"]).data)
-        rf.append(weighter(arr["effective_radiative_forcing"]).data)
+    tropical_limit = 10
+    tropical = ~(np.abs(ds.eruption_latitude_degrees_n) > tropical_limit)
+    seasons = core.utils.time_series.weighted_season_means(
+        ds.isel(eruption=tropical.data)
+    )
+    time = core.utils.time_series.dt2float(seasons.time.data, days_in_year=360)
     # All arrays now have time dimensions in float format, starting at 0.0.
-    return np.asarray(time), np.asarray(aod), np.asarray(rf)
+    return (
+        np.tile(np.asarray(time), (seasons.sizes["eruption"], 1)),
+        seasons["stratospheric_aerosol_optical_depth_at_550_nm"].data,
+        seasons["effective_radiative_forcing"].data,
+    )
@@ -6,143 +6,344 @@ See https://doi.org/10.1175/BAMS-D-14-00233.1 for the full paper and link to whe
 datasets are stored.
 """
 
+import concurrent.futures
 import datetime
+import functools
 import itertools
+import json
+import pathlib
 import re
-import subprocess
-from typing import Literal
+from typing import Literal, Self
 
+import cftime
+import dask
 import numpy as np
-import requests
-import rich.progress
 import scipy
 import xarray as xr
 
 import paper1_code as core
+from paper1_code.load.download import DownloadManager, read_manifest
+
+TIME_UNITS = "days since 0850-01-01"
+CALENDAR = "noleap"
+# The download scripts of the daily CESM-LME output, from the NCAR Climate Data
+# Gateway (dataset ucar.cgd.ccsm4.cesmLME.atm.proc.daily_ave).
+_SCRIPT = "python-ucar.cgd.ccsm4.cesmLME.atm.proc.daily_ave."
+DOWNLOAD_SCRIPTS = {
+    "FSNTOA": f"{_SCRIPT}FSNTOA-20240103T0650.py",
+    "TREFHT": f"{_SCRIPT}TREFHT-20240103T0651.py",
+}
+
+
+class DailySeries:
+    """A long time series stored as uncompressed, memory-mapped .npy files.
+
+    A series with the stem `name` is stored in a directory as
+
+    - ``name.npy``: the values,
+    - ``name-time.npy``: the time axis as numeric offsets in `units`,
+    - ``name.json``: the `units` and `calendar` of the time axis.
+
+    Opening a series only maps the files, and `sel`/`isel` read and decode the time
+    steps of the requested window only.
+
+    Parameters
+    ----------
+    stem : pathlib.Path
+        The path of the series without suffix.
+
+    Examples
+    --------
+    >>> series = DailySeries(core.config.DATA_DIR_ROOT / "cesm-lme" / "TREFHT-001")
+    >>> series.sel("1815-01-01", "1820-12-31")
+    """
+
+    def __init__(self, stem: pathlib.Path) -> None:
+        self.stem = pathlib.Path(stem)
+        self.data = np.load(self.stem.with_suffix(".npy"), mmap_mode="r")
+        self.offsets = np.load(self._time_file(self.stem), mmap_mode="r")
+        meta = json.loads(self.stem.with_suffix(".json").read_text(encoding="utf-8"))
+        self.units: str = meta["units"]
+        self.calendar: str = meta["calendar"]
+
+    @staticmethod
+    def _time_file(stem: pathlib.Path) -> pathlib.Path:
+        return stem.with_name(f"{stem.name}-time.npy")
+
+    @classmethod
+    def exists(cls, stem: pathlib.Path) -> bool:
+        """Check if all files of a series are present."""
+        stem = pathlib.Path(stem)
+        files = (
+            stem.with_suffix(".npy"),
+            cls._time_file(stem),
+            stem.with_suffix(".json"),
+        )
+        return all(file.exists() for file in files)
+
+    @classmethod
+    def save(
+        cls,
+        stem: pathlib.Path,
+        data: np.ndarray,
+        times: np.ndarray | None = None,
+        calendar: str = CALENDAR,
+    ) -> Self:
+        """Save a series, converting a cftime axis to offsets in `TIME_UNITS`.
+
+        Without `times`, the series is saved on a daily axis from 0850-01-01, which is
+        the time axis all the CESM-LME series are used on.
+        """
+        stem = pathlib.Path(stem)
+        offsets = np.arange(len(data)) if times is None else np.asarray(times)
+        if not np.issubdtype(offsets.dtype, np.number):
+            offsets = cftime.date2num(offsets, TIME_UNITS, calendar)
+        np.save(stem.with_suffix(".npy"), np.asarray(data))
+        np.save(cls._time_file(stem), offsets.astype(np.float64))
+        meta = {"units": TIME_UNITS, "calendar": calendar}
+        stem.with_suffix(".json").write_text(json.dumps(meta), encoding="utf-8")
+        return cls(stem)
+
+    @classmethod
+    def from_npz(cls, npz_file: pathlib.Path) -> Self:
+        """Convert a series saved by an earlier version as a .npz file.
+
+        The stored times are not used, the series is put on the daily axis from
+        0850-01-01 (see `save`).
+        """
+        array = _load_numpy(npz_file)
+        return cls.save(npz_file.with_suffix(""), array.data)
+
+    def __len__(self) -> int:
+        """Return the number of time steps."""
+        return len(self.data)
+
+    def _to_offset(self, date: str | cftime.datetime) -> float:
+        if isinstance(date, str):
+            date = cftime.datetime(
+                *(int(part) for part in date.split("-")), calendar=self.calendar
+            )
+        return float(cftime.date2num(date, self.units, self.calendar))
+
+    def sel(
+        self,
+        start: str | cftime.datetime | None = None,
+        stop: str | cftime.datetime | None = None,
+    ) -> xr.DataArray:
+        """Return the window between two dates, both included.
+
+        Parameters
+        ----------
+        start : str | cftime.datetime | None
+            The first date, as a cftime date or a string "YYYY-MM-DD". Default is the
+            start of the series.
+        stop : str | cftime.datetime | None
+            The last date. Default is the end of the series.
+
+        Returns
+        -------
+        xr.DataArray
+            The window, in memory.
+        """
+        lo = 0 if start is None else self._to_offset(start)
+        hi = np.inf if stop is None else self._to_offset(stop)
+        first = int(np.searchsorted(self.offsets, lo, side="left"))
+        last = int(np.searchsorted(self.offsets, hi, side="right"))
+        return self.isel(slice(first, last))
+
+    def isel(self, index: slice | None = None) -> xr.DataArray:
+        """Return the time steps in `index`, or the full series by default."""
+        index = slice(None) if index is None else index
+        offsets = np.asarray(self.offsets[index])
+        time = _decode_time(offsets, self.units, self.calendar)
+        data = np.array(self.data[index])
+        return xr.DataArray(data, dims=["time"], coords={"time": time})
+
+
+def _decode_time(offsets: np.ndarray, units: str, calendar: str) -> np.ndarray:
+    """Decode a time axis, reusing the result for equally spaced axes."""
+    if len(offsets) > 1 and np.all(np.diff(offsets) == offsets[1] - offsets[0]):
+        step = float(offsets[1] - offsets[0])
+        return _decode_regular(float(offsets[0]), step, len(offsets), units, calendar)
+    return cftime.num2date(offsets, units, calendar)
+
+
+@functools.lru_cache(maxsize=8)
+def _decode_regular(
+    first: float, step: float, n: int, units: str, calendar: str
+) -> np.ndarray:
+    out = cftime.num2date(first + step * np.arange(n), units, calendar)
+    out.flags.writeable = False
+    return out
+
+
+def _open_series(path: pathlib.Path, name: str) -> DailySeries:
+    """Open a series, converting it from an earlier .npz file if needed."""
+    stem = path / name
+    if not DailySeries.exists(stem) and (npz := stem.with_suffix(".npz")).exists():
+        return DailySeries.from_npz(npz)
+    return DailySeries(stem)
 
 
 def save_to_npz() -> None:
-    """Save the OB16 data to .npz files."""
-    # Download OB16 output datasets.
-    _download_ob16_output_files()
-    # Combine and convert the datasets and save to compressed .npz files.
+    """Save the OB16 data as memory-mapped series (see `DailySeries`)."""
     path = core.config.DATA_DIR_ROOT / "cesm-lme"
     if not path.exists():
         path.mkdir(parents=False)
+    # Download OB16 output datasets.
+    _download_ob16_output_files(path)
+    # Combine and convert the datasets and save as .npy files.
     _save_output_files_to_npz(path)
     # Input file with injected SO2.
     _download_so2_file(path)
-    print(f"You might want to clean up the .nc files in {core.config.PROJECT_ROOT}.")
-
+    print(f"You might want to clean up the .nc files in {path}.")
 
-def _download_ob16_output_files() -> None:
-    script_path = core.config.PROJECT_ROOT / "src" / "paper1_code" / "load"
-    script = "python-ucar.cgd.ccsm4.cesmLME.atm.proc.daily_ave."
-    subprocess.call(["python", script_path / f"{script}FSNTOA-20240103T0650.py"])
-    subprocess.call(["python", script_path / f"{script}TREFHT-20240103T0651.py"])
 
-
-def _save_output_files_to_npz(path) -> None:
+def _output_files(
+    path: pathlib.Path,
+) -> list[tuple[list[pathlib.Path], str, pathlib.Path]]:
+    """Return the output files, variable and series stem of each member."""
     file0 = "b.e11.BLMTRC5CN.f19_g16.VOLC_GRA.00"
     file1 = ".cam.h0."
     file2_0 = ".08500101-18491231.nc"
     file2_1 = ".18500101-20051231.nc"
-    # Temperature.
-    for i in range(5):
-        file_0 = file0 + str(i + 1) + file1 + "TREFHT" + file2_0
-        file_1 = file0 + str(i + 1) + file1 + "TREFHT" + file2_1
-        data = xr.open_mfdataset([file_0, file_1])
-        array = core.utils.time_series.mean_flatten(data["TREFHT"], dims=["lat", "lon"])
-        np.savez(path / f"TREFHT-00{i + 1}", data=array.data, times=array.time.data)
-    # RF forcing
-    for i in range(5):
-        file_0 = file0 + str(i + 1) + file1 + "FSNTOA" + file2_0
-        file_1 = file0 + str(i + 1) + file1 + "FSNTOA" + file2_1
-        data = xr.open_mfdataset([file_0, file_1])
-        array = core.utils.time_series.mean_flatten(data["FSNTOA"], dims=["lat", "lon"])
-        np.savez(path / f"FSNTOA-00{i + 1}", data=array.data, times=array.time.data)
+    jobs = [
+        (
+            [
+                path / f"{file0}{i + 1}{file1}{var}{file2_0}",
+                path / f"{file0}{i + 1}{file1}{var}{file2_1}",
+            ],
+            var,
+            path / f"{var}-00{i + 1}",
+        )
+        # Temperature and RF forcing.
+        for var in ("TREFHT", "FSNTOA")
+        for i in range(5)
+    ]
     # Control run for temperature.
-    data = xr.open_mfdataset(
-        [
-            "b.e11.BLMTRC5CN.f19_g16.850forcing.003.cam.h0.TREFHT.08500101-18491231.nc",
-            "b.e11.BLMTRC5CN.f19_g16.850forcing.003.cam.h0.TREFHT.18500101-20051231.nc",
-        ]
+    control = "b.e11.BLMTRC5CN.f19_g16.850forcing.003.cam.h0.TREFHT"
+    jobs.append(
+        (
+            [path / f"{control}{file2_0}", path / f"{control}{file2_1}"],
+            "TREFHT",
+            path / "TREFHT850forcing-control-003",
+        )
     )
-    array = core.utils.time_series.mean_flatten(data["TREFHT"], dims=["lat", "lon"])
-    np.savez(
-        path / "TREFHT850forcing-control-003.npz",
-        data=array.data,
-        times=array.time.data,
+    return jobs
+
+
+def _download(path: pathlib.Path, files: list[tuple[str, str]], **kwargs) -> None:
+    """Download files to `path`, verified against the checksums in its manifest.
+
+    The checksum of a file is added to ``manifest.json`` in `path` the first time it
+    is downloaded, and later downloads of the file must match it. Keyword arguments
+    are passed on to `DownloadManager`.
+    """
+    manifest = path / "manifest.json"
+    known = (
+        {e.path: e.sha256 for e in read_manifest(manifest)} if manifest.exists() else {}
     )
+    manager = DownloadManager(path, **kwargs)
+    for url, name in files:
+        manager.add(url, name, known.get(name))
+    manager.download()
+    manager.update_manifest(manifest)
+
+
+def _script_urls(var: str) -> dict[str, str]:
+    """Return the URLs in the Climate Data Gateway download script of `var`, by name.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the download script is not found.
+    """
+    script = core.config.PROJECT_ROOT / "src" / "paper1_code" / "load"
+    script /= DOWNLOAD_SCRIPTS[var]
+    if not script.exists():
+        raise FileNotFoundError(
+            f"Cannot find {script}. Get the download script of {var} from the NCAR"
+            " Climate Data Gateway (ucar.cgd.ccsm4.cesmLME.atm.proc.daily_ave)."
+        )
+    urls = re.findall(r"https?://[^\s'\"]+\.nc", script.read_text(encoding="utf-8"))
+    return {url.rsplit("/", 1)[-1]: url for url in urls}
+
+
+def _download_ob16_output_files(path: pathlib.Path, max_workers: int = 4) -> None:
+    """Download the output files listed in the Climate Data Gateway scripts."""
+    urls = {var: _script_urls(var) for var in DOWNLOAD_SCRIPTS}
+    files = []
+    for names, var, _ in _output_files(path):
+        for file in names:
+            if file.name in urls[var]:
+                files.append((urls[var][file.name], file.name))
+            else:
+                print(f"Warning: {file.name} is not in {DOWNLOAD_SCRIPTS[var]}.")
+    _download(path, files, max_workers=max_workers)
+
+
+def _save_output_files_to_npz(
+    path: pathlib.Path, max_workers: int | None = None, time_chunk: int = 3650
+) -> None:
+    """Reduce the CESM-LME output files to global means, one process per file set.
+
+    Each member and variable (and the control run) is converted by its own worker,
+    which reads and reduces `time_chunk` days at a time, so memory use is bounded by
+    the chunk size and the run time by disk bandwidth.
+    """
+    jobs = _output_files(path)
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as pool:
+        for out in pool.map(_convert_output_files, jobs, itertools.repeat(time_chunk)):
+            print(f"Saved {out}")
+
+
+def _convert_output_files(
+    job: tuple[list[pathlib.Path], str, pathlib.Path], time_chunk: int
+) -> pathlib.Path:
+    files, var, out = job
+    # Each process is one worker, so dask should not spawn threads of its own.
+    with (
+        dask.config.set(scheduler="synchronous"),
+        xr.open_mfdataset(files, chunks={"time": time_chunk}) as data,
+    ):
+        array = core.utils.time_series.mean_flatten(data[var], dims=["lat", "lon"])
+        array = array.compute()
+    DailySeries.save(out, array.data)
+    return out
 
 
 def _download_so2_file(path) -> None:
     name = "IVI2LoadingLatHeight501-2000_L18_c20100518.nc"
-    if (path / name).exists():
-        print(
-            f"{path / name} already exists, so I skip this. Delete it first if you are"
-            " sure you want to download it again."
-        )
-        return
     url = f"https://svn-ccsm-inputdata.cgd.ucar.edu/trunk/inputdata/atm/cam/volc/{name}"
-    progress = rich.progress.Progress(
-        rich.progress.TextColumn("[progress.description]{task.description}"),
-        rich.progress.SpinnerColumn(),
-        rich.progress.BarColumn(),
-        rich.progress.TaskProgressColumn(),
-        rich.progress.MofNCompleteColumn(),
-        rich.progress.TimeRemainingColumn(elapsed_when_finished=True),
-    )
-    with requests.get(url, stream=True, verify=False) as r:
-        r.raise_for_status()
-        with open(path / name, "wb") as f:
-            with progress:
-                for chunk in progress.track(
-                    r.iter_content(chunk_size=8192),
-                    total=20851,
-                    description="[cyan]Downloading file...",
-                ):
-                    # If you have chunk encoded response uncomment if
-                    # and set chunk_size parameter to None.
-                    # if chunk:
-                    f.write(chunk)
-
-
-def _get_ob16_rf_temp_arrays() -> tuple[list[xr.DataArray], list[xr.DataArray]]:
-    """Create samples from Otto-Bliesner et al. 2016.
+    # The certificate of the input data server is not always valid.
+    _download(path, [(url, name)], verify=False)
+
+
+def _get_ob16_rf_temp_arrays() -> tuple[list[DailySeries], list[DailySeries]]:
+    """Open the RF and temperature series of the Otto-Bliesner et al. 2016 members.
 
     Returns
     -------
-    tuple[list[xr.DataArray], list[xr.DataArray]]
-        The SAOD and RF arrays in two lists
+    tuple[list[DailySeries], list[DailySeries]]
+        The RF and temperature series in two lists
 
     Raises
     ------
     FileNotFoundError
         If the directory where all the files is not found.
     """
-    # Need SAOD and RF seasonal and annual means, as well as an array of equal length
-    # with the corresponding time-after-eruption.
     path = core.config.DATA_DIR_ROOT / "cesm-lme"
     if not path.exists():
         raise FileNotFoundError(
             "Cannot find CESM-LME files. You may try to run the `save_to_npz` function"
             f" within {__name__}."
         )
-    pattern = re.compile("([A-Z]+)-00[1-5]\\.npz$", re.X)
-    files_ = list(path.rglob("*00[1-5].npz"))
     rf, temp = [], []
-    for file in files_:
-        if isinstance(search := pattern.search(str(file)), re.Match):
-            array = _load_numpy(file.resolve())
-            s = "0850-01-01"
-            t = xr.cftime_range(
-                start=s, periods=len(array.data), calendar="noleap", freq="D"
-            )
-            if search.groups()[0] == "TREFHT":
-                temp.append(array.assign_coords({"time": t}))
-            elif search.groups()[0] == "FSNTOA":
-                rf.append(array.assign_coords({"time": t}))
+    for i in range(5):
+        for var, out in (("TREFHT", temp), ("FSNTOA", rf)):
+            stem = path / f"{var}-00{i + 1}"
+            if DailySeries.exists(stem) or stem.with_suffix(".npz").exists():
+                out.append(_open_series(path, stem.name))
     return rf, temp
 
 
@@ -166,67 +367,73 @@ def _load_numpy(np_file) -> xr.DataArray:
     return xarr
 
 
+def _control_climatology(path: pathlib.Path) -> dict[str, np.ndarray]:
+    """Load the daily and monthly control run climatology, computing it once.
+
+    The climatology is saved next to the control run series, together with the
+    first and last time offset of the control run. It is computed again if the
+    length or modification time of the control run series has changed.
+    """
+    name = "TREFHT850forcing-control-003"
+    file = path / f"{name}-climatology.npz"
+    control = _open_series(path, name)
+    key = {
+        "length": len(control),
+        "mtime": control.stem.with_suffix(".npy").stat().st_mtime,
+    }
+    if file.exists():
+        with np.load(file) as data:
+            cached = dict(data)
+        if all(k in cached and cached[k] == v for k, v in key.items()):
+            return cached
+    raw_temp = control.isel()
+    day = raw_temp.groupby("time.dayofyear").mean().data
+    # Mean over the years of the monthly means.
+    month = raw_temp.resample(time="MS").mean().groupby("time.month").mean().data
+    out = {
+        "day": day,
+        "month": month,
+        "start": control.offsets[0],
+        "stop": control.offsets[-1],
+        **key,
+    }
+    np.savez(file, **out)
+    return out
+
+
 def _remove_seasonality_ob16(arr: xr.DataArray, monthly: bool = False) -> xr.DataArray:
-    """Remove seasonality by subtracting CESM LME control run."""
-    file_name = (
-        core.config.DATA_DIR_ROOT / "cesm-lme" / "TREFHT850forcing-control-003.npz"
-    )
-    if file_name.exists():
-        array = _load_numpy(file_name.resolve())
-        s = "0850-01-01"
-        t = xr.cftime_range(
-            start=s, periods=len(array.data), calendar="noleap", freq="D"
-        )
-        raw_temp = array.assign_coords({"time": t})
+    """Remove seasonality by subtracting CESM LME control run.
+
+    The climatology of the control run is looked up by the day of year (or month) of
+    each time step, and the array is restricted to the period of the control run.
+    """
+    clim = _control_climatology(core.config.DATA_DIR_ROOT / "cesm-lme")
+    start, stop = cftime.num2date([clim["start"], clim["stop"]], TIME_UNITS, CALENDAR)
+    arr = arr.sel(time=slice(start, stop))
     if monthly:
-        raw_temp = raw_temp.resample(time="MS").mean()
-        raw_temp, arr = xr.align(raw_temp, arr)
-        month_mean = raw_temp.groupby("time.month").mean("time")
-        return arr.groupby("time.month") - month_mean + core.config.MEANS["TREFHT"]
-    day_mean = raw_temp.groupby("time.dayofyear").mean()
-    raw_temp, arr = xr.align(raw_temp, arr)
-    return arr.groupby("time.dayofyear") - day_mean + core.config.MEANS["TREFHT"]
-
-
-def _gao_remove_decay_in_forcing(
-    frc: np.ndarray, y: np.ndarray
-) -> tuple[np.ndarray, np.ndarray]:
-    new_frc = np.zeros_like(frc)
+        idx = arr.time.dt.month.data - 1
+        return arr - clim["month"][idx] + core.config.MEANS["TREFHT"]
+    idx = arr.time.dt.dayofyear.data - 1
+    return arr - clim["day"][idx] + core.config.MEANS["TREFHT"]
+
+
+def _gao_spikes(frc: np.ndarray) -> np.ndarray:
+    # Keep the values above the limit that are larger than the previous value, but
+    # not those that are smaller than the next value, i.e. keep the top of each spike.
     limit = 2e-6
-    for i, v in enumerate(frc):
-        if i == 0 and v > limit:
-            new_frc[i] = v
-            continue
-        if v > limit and v > frc[i - 1]:
-            new_frc[i] = v
-        if new_frc[i - 1] > limit and new_frc[i - 1] < v:
-            new_frc[i - 1] = 0
-    # Go from monthly to daily (this is fine as long as we use a spiky forcing). We
-    # start in December.
-    new_frc = _month2day(new_frc, start=12)
-    # The new time axis now goes down to one day
-    y = np.linspace(501, 2002, (2002 - 501) * 365 + 1)
-    y = y[: len(new_frc)]
-    return new_frc, y
+    prev = np.r_[-np.inf, frc[:-1]]
+    next_ = np.r_[frc[1:], -np.inf]
+    return (frc > limit) & (frc > prev) & ~(frc < next_)
 
 
-def _month2day(
-    arr: np.ndarray,
+def _month_first_day(
+    n_months: int,
     start: Literal[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12] = 1,
 ) -> np.ndarray:
-    # Go from monthly to daily
-    newest = np.array([])
-    # Add 30, 29 or 27 elements between all elements: months -> days
+    # Add 30, 29 or 27 days after each month: months -> days
     days_ = (30, 27, 30, 29, 30, 29, 30, 30, 29, 30, 29, 30)
-    days = itertools.cycle(days_)
-    for _ in range(start - 1):
-        next(days)
-    for month in arr:
-        insert_ = np.zeros(next(days))
-        newest = np.r_[newest, np.array([month])]
-        newest = np.r_[newest, insert_]
-    # The new time axis now goes down to one day
-    return newest
+    length = np.resize(np.roll(days_, 1 - start), n_months) + 1
+    return np.cumsum(length) - length
 
 
 def _get_so2_ob16_full_timeseries() -> tuple[np.ndarray, np.ndarray]:
@@ -261,14 +468,14 @@ def _get_so2_ob16_full_timeseries() -> tuple[np.ndarray, np.ndarray]:
     return year, avgs
 
 
-def _get_so2_ob16() -> xr.DataArray:
+def _get_so2_ob16() -> core.utils.time_series.EventSeries:
     """Load in mean stratospheric volcanic sulfate aerosol injections.
 
     Returns
     -------
-    xr.DataArray
+    core.utils.time_series.EventSeries
         The stratospheric sulfate injections used as forcing in the CESM LME
-        simulations.
+        simulations, as daily events.
 
     Notes
     -----
@@ -276,18 +483,32 @@ def _get_so2_ob16() -> xr.DataArray:
     <http://climate.envsci.rutgers.edu/IVI2/>`_, and was used as input to the model
     simulations by Otto-Bliesner et al. (2017).
     """
-    y, g = _get_so2_ob16_full_timeseries()
-    y = y - y[0] + 501
-    g, y = _gao_remove_decay_in_forcing(g, y)
-    freq = "D"
-    da = xr.DataArray(
-        g,
-        dims=["time"],
-        coords={"time": core.utils.time_series.float2dt(y, freq)},
+    _, g = _get_so2_ob16_full_timeseries()
+    # Go from monthly to daily (this is fine as long as we use a spiky forcing). We
+    # start in December, and the daily time axis goes from 501 to 2002.
+    spikes = np.flatnonzero(_gao_spikes(g))
+    day = _month_first_day(len(g), start=12)[spikes]
+    keep = day <= (2002 - 501) * 365
+    time = cftime.num2date(day[keep] + 14, "days since 0501-01-01", CALENDAR)
+    return core.utils.time_series.EventSeries(
+        time,
+        g[spikes][keep],
         name="Mean stratospheric volcanic sulfate aerosol injections [Tg]",
     )
-    da = da.assign_coords(time=da.time.data + datetime.timedelta(days=14))
-    return da
+
+
+def _median(series: list[DailySeries]) -> xr.DataArray:
+    """Return the ensemble median of the series, like `get_median`.
+
+    The median is taken from the memory-mapped values, so only the time axis of the
+    first member is decoded.
+    """
+    members = np.stack([s.data for s in series]).astype(core.config.PRECISION)
+    first = series[0]
+    time = _decode_time(np.asarray(first.offsets), first.units, first.calendar)
+    return xr.DataArray(
+        np.median(members, axis=0), dims=["time"], coords={"time": time}
+    )
 
 
 def get_ob16() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
@@ -301,13 +522,11 @@ def get_ob16() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         SO2 peaks, RF peaks and temperature peaks
     """
     # Temperature
-    ds, temp_ = _get_ob16_rf_temp_arrays()
-    temp_xr = core.utils.time_series.get_median(temp_, xarray=True)
+    rf, temp = _get_ob16_rf_temp_arrays()
     # Seasonality is removed by use of a control run temperature time series, where we
     # compute a climatology mean for each day of the year which is subtracted from the
     # time series.
-    # temp_xr = temp_xr.assign_coords(time=core.utils.time_series.float2dt(temp_xr.time.data))
-    temp_xr = _remove_seasonality_ob16(temp_xr)
+    temp_xr = _remove_seasonality_ob16(_median(temp))
     # Adjust the temperature so its mean is at zero, and fluctuations are positive. We
     # also remove a slight drift by means of a linear regression fit.
     temp_xr *= -1
@@ -317,9 +536,9 @@ def get_ob16() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
 
     # Add RF from the FSNTOA variable (daily) ---------------------------------------- #
     # We load in the original FSNTOA 5 member ensemble and compute the ensemble mean.
-    rf = core.utils.time_series.get_median(ds, xarray=True)
+    rf_xr = _median(rf)
     # Remove noise in Fourier domain (seasonal and 6-month cycles)
-    rf_fr = core.utils.time_series.remove_seasonality([rf.copy()])[0]
+    rf_fr = core.utils.time_series.remove_seasonality([rf_xr])[0]
     rf_fr = core.utils.time_series.remove_seasonality([rf_fr], freq=2)[0]
     # Subtract the mean and flip
     rf_fr.data -= rf_fr.data.mean()
@@ -331,37 +550,15 @@ def get_ob16() -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     # back give the best timing for when the temperature and radiative forcing
     # perturbations start (eruption day). Done by eye measure.
     d1, d2, d3 = 190, 150, 210
-    so2_start = so2_start.assign_coords(
-        time=so2_start.time.data - datetime.timedelta(days=d1)
-    )
-    so2_rf_peak = so2_start.assign_coords(
-        time=so2_start.time.data + datetime.timedelta(days=d2)
-    )
-    so2_temp_peak = so2_start.assign_coords(
-        time=so2_start.time.data + datetime.timedelta(days=d3)
-    )
-
-    so2_start, so2_rf_peak, so2_temp_peak, rf_fr, temp = xr.align(
-        so2_start, so2_rf_peak, so2_temp_peak, rf_fr, temp_xr
-    )
-
-    if not len(so2_start) % 2:
-        so2_start = so2_start[:-1]
-        so2_rf_peak = so2_rf_peak[:-1]
-        so2_temp_peak = so2_rf_peak[:-1]
-        rf_fr = rf_fr[:-1]
-        temp = temp[:-1]
-    _cesm_lme_so2_start = so2_start
-    _cesm_lme_so2_rf_peak = so2_rf_peak
-    _cesm_lme_so2_temp_peak = so2_temp_peak
-    _cesm_lme_rf = rf_fr
-    _cesm_lme_temp = temp
-    # Mask out all non-zero forcing values, and the corresponding temperature values.
-    _idx_rf = np.argwhere(so2_rf_peak.data > 0)
-    _idx_temp = np.argwhere(so2_temp_peak.data > 0)
-    so2 = so2_rf_peak.data[_idx_rf].flatten()
-    rf_v = rf_fr.data[_idx_rf].flatten()
-    temp_v = temp.data[_idx_temp].flatten()
+    so2_start = so2_start.shift(-datetime.timedelta(days=d1))
+    # We take the radiative forcing and temperature in a window after each eruption,
+    # and sample the peaks from it.
+    rf_w = so2_start.windows(rf_fr, post=d3)
+    temp_w = so2_start.windows(temp_xr, post=d3)
+    rf_w, temp_w = xr.align(rf_w, temp_w)
+    so2 = rf_w.magnitude.data
+    rf_v = rf_w.sel(lag=d2).data
+    temp_v = temp_w.sel(lag=d3).data
     _ids = so2.argsort()
     return so2[_ids], rf_v[_ids], temp_v[_ids]
 
@@ -0,0 +1,103 @@
+"""Benchmark the float32 mode of the global mean reductions.
+
+A synthetic field with the shape and magnitude of monthly CESM2 output is reduced to a
+global mean time series, a median across members and a temperature anomaly, with
+``config.PRECISION`` set to "float64" (the reference), "float32" (float32 storage with
+float64 accumulation), and with plain float32 accumulation. The table that is printed
+is the error budget of the float32 mode.
+"""
+
+import time
+from collections.abc import Callable
+
+import numpy as np
+import xarray as xr
+
+import paper1_code as core
+
+
+def _synthetic_field(
+    members: int = 3, years: int = 10, seed: int = 0
+) -> list[xr.DataArray]:
+    """Create TREFHT-like members on the f19 grid, stored as float32."""
+    rng = np.random.default_rng(seed)
+    lat = np.linspace(-90, 90, 96)
+    lon = np.linspace(0, 357.5, 144)
+    time_ = xr.cftime_range(
+        start="1850-01-01", periods=12 * years, calendar="noleap", freq="MS"
+    )
+    base = 300 - 50 * np.sin(np.deg2rad(lat)) ** 2
+    arrs = []
+    for i in range(members):
+        data = base[None, :, None] + rng.normal(0, 5, (len(time_), len(lat), len(lon)))
+        arr = xr.DataArray(
+            data.astype(np.float32),
+            dims=["time", "lat", "lon"],
+            coords={"time": time_, "lat": lat, "lon": lon},
+            attrs={"ensemble": f"ens{i + 1}"},
+        )
+        arrs.append(arr)
+    return arrs
+
+
+def _naive_float32(arrs: list[xr.DataArray]) -> list[xr.DataArray]:
+    """Reduce with float32 weights and float32 accumulators throughout."""
+    out = []
+    for arr in arrs:
+        weights = np.cos(np.deg2rad(arr.lat)).astype(np.float32)
+        out.append(arr.weighted(weights).mean("lat").mean("lon", dtype=np.float32))
+    return out
+
+
+def _run(
+    func: Callable[[list[xr.DataArray]], list[xr.DataArray]],
+    arrs: list[xr.DataArray],
+    precision: str,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    previous = core.config.PRECISION
+    core.config.PRECISION = precision  # type: ignore[assignment]
+    try:
+        start = time.perf_counter()
+        means = func([arr.copy() for arr in arrs])
+        _, median = core.utils.time_series.get_median(means)
+        elapsed = time.perf_counter() - start
+    finally:
+        core.config.PRECISION = previous
+    return np.asarray([m.data for m in means]), median, elapsed
+
+
+def main(members: int = 3, years: int = 10) -> None:
+    """Print the error budget and timing of the float32 reductions."""
+    arrs = _synthetic_field(members, years)
+
+    def flatten(a: list[xr.DataArray]) -> list[xr.DataArray]:
+        return core.utils.time_series.mean_flatten(a, dims=["lat", "lon"])
+
+    ref_mean, ref_median, ref_t = _run(
+        flatten, [arr.astype(np.float64) for arr in arrs], "float64"
+    )
+    runs = {
+        "float64 (reference)": (ref_mean, ref_median, ref_t),
+        "float32, float64 accumulation": _run(flatten, arrs, "float32"),
+        "float32, float32 accumulation": _run(_naive_float32, arrs, "float32"),
+    }
+    eps = np.finfo(np.float32).eps
+    anomaly = ref_mean - core.config.MEANS["TREFHT"]
+    print(f"Input: {members} x {arrs[0].shape}, {arrs[0].nbytes / 2**20:.1f} MiB each")
+    print(f"float32 machine epsilon: {eps:.2e}")
+    head = f"{'mode':<32}{'time [s]':>10}{'mean err [K]':>14}{'rel err':>10}"
+    print(f"{head}{'median err [K]':>16}{'anom. rel err':>15}")
+    for name, (mean, median, elapsed) in runs.items():
+        err = np.abs(mean - ref_mean).max()
+        rel = err / np.abs(ref_mean).max()
+        med_err = np.abs(median - ref_median).max()
+        anom = mean - core.config.MEANS["TREFHT"]
+        anom_rel = (np.abs(anom - anomaly) / np.abs(anomaly)).max()
+        print(
+            f"{name:<32}{elapsed:>10.3f}{err:>14.2e}{rel:>10.2e}{med_err:>16.2e}"
+            f"{anom_rel:>15.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
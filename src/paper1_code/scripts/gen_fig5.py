@@ -1,5 +1,7 @@
 """Create plots of some extra key eruption parameters."""
 
+import functools
+import pathlib
 from collections import namedtuple
 from typing import Literal
 
@@ -28,12 +30,14 @@ class ReffPlot:
     sad_ = FINDER().keep("SAD_AERO")
     reff_ = FINDER().keep("REFF_AERO")
     temp_ = FINDER().keep("T")
+    trop_ = FINDER().keep("TROP_P")
 
     def print(self) -> None:
         """Print all data that is being used."""
         print(self.sad_)
         print(self.reff_)
         print(self.temp_)
+        print(self.trop_)
 
     def ens2median(self, arr: list[xr.DataArray]) -> xr.DataArray:
         """Combine a list of arrays from different (known) ensembles into a median."""
@@ -43,29 +47,50 @@ class ReffPlot:
         arr_ = arr_[: int(12 * 16)]
         return arr_.assign_coords(time=vbm.dt2float(arr_.time.data) - 1850)
 
+    @staticmethod
+    def _paths(finder: FindFiles) -> list[pathlib.Path]:
+        """Return the paths of the matched files, without opening them."""
+        return [
+            finder.regex.reverse_search(file, ".nc")
+            for file in finder.get_files().unwrap()
+        ]
+
     def compute(self) -> xr.Dataset:
         """Compute the effective radius for all simulations."""
-        sad = self.sad_.load()
-        reff = self.reff_.load()
-        temp = self.temp_.load()
-        reff_s21 = core.utils.reff.Reff(reff[0], temp[0], sad[0]).calculate_reff()
-        reff_s41 = core.utils.reff.Reff(reff[1], temp[1], sad[1]).calculate_reff()
-        reff_m21 = core.utils.reff.Reff(reff[2], temp[2], sad[2]).calculate_reff()
-        reff_m41 = core.utils.reff.Reff(reff[3], temp[3], sad[3]).calculate_reff()
-        reff_s23 = core.utils.reff.Reff(reff[4], temp[4], sad[4]).calculate_reff()
-        reff_s43 = core.utils.reff.Reff(reff[5], temp[5], sad[5]).calculate_reff()
-        reff_m23 = core.utils.reff.Reff(reff[6], temp[6], sad[6]).calculate_reff()
-        reff_m43 = core.utils.reff.Reff(reff[7], temp[7], sad[7]).calculate_reff()
+        # The worker processes are given the file paths, so each of them only reads
+        # the chunks of its own simulation.
+        reff = core.utils.reff.calculate_reff_batch(
+            self._paths(self.reff_),
+            self._paths(self.temp_),
+            self._paths(self.sad_),
+            trop_p=self._paths(self.trop_),
+        ).reff
+        groups = list(self.reff_.regex.groups.values())
+        meta = [
+            dict(zip(groups, file, strict=True))
+            for file in self.reff_.get_files().unwrap()
+        ]
+        reff = reff.assign_coords(
+            case=("sim", [m["sim"] for m in meta]),
+            ensemble=("sim", [m["ensemble"] for m in meta]),
+        )
         e2m = self.ens2median
-        attrs = {"plot_c": COLOR[0], "plot_ls": "-"}
-        reff_s2 = e2m([reff_s21, reff_s23]).assign_attrs(**attrs).rename("S26, 2sep")
-        attrs = {"plot_c": COLOR[1], "plot_ls": "-"}
-        reff_s4 = e2m([reff_s41, reff_s43]).assign_attrs(**attrs).rename("S26, 4sep")
-        attrs = {"plot_c": COLOR[2], "plot_ls": "-"}
-        reff_m2 = e2m([reff_m21, reff_m23]).assign_attrs(**attrs).rename("S400, 2sep")
-        attrs = {"plot_c": COLOR[3], "plot_ls": "-"}
-        reff_m4 = e2m([reff_m41, reff_m43]).assign_attrs(**attrs).rename("S400, 4sep")
-        return xr.merge([reff_s2, reff_s4, reff_m2, reff_m4])
+        out = []
+        for i, (case, name) in enumerate(
+            [
+                ("medium-2sep", "S26, 2sep"),
+                ("medium-4sep", "S26, 4sep"),
+                ("tt-2sep", "S400, 2sep"),
+                ("tt-4sep", "S400, 4sep"),
+            ]
+        ):
+            members = [
+                r.dropna("time").assign_attrs(ensemble=str(r.ensemble.data))
+                for r in reff.where(reff.case == case, drop=True)
+            ]
+            attrs = {"plot_c": COLOR[i], "plot_ls": "-"}
+            out.append(e2m(members).assign_attrs(**attrs).rename(name))
+        return xr.merge(out)
 
     def load(self) -> xr.Dataset:
         """Get or generate the data as a xarray data set."""
@@ -135,19 +160,40 @@ class OHPlot:
     oh_m4: FindFiles = _FINDER().keep("medium-4sep")
     oh_p2: FindFiles = _FINDER().keep("tt-2sep", {"ens1", "ens3"})
     oh_p4: FindFiles = _FINDER().keep("tt-4sep", {"ens1", "ens3"})
+    _TROP: FindFiles = (
+        FindFiles().find("TROP_P", "e_fSST1850").sort("sim", "ensemble").copy
+    )
+
+    @functools.cached_property
+    def _trop_p(self) -> dict[tuple[str, str], xr.DataArray]:
+        """The TROP_P field of each simulation and ensemble, opened lazily once."""
+        return {(a.attrs["sim"], a.attrs["ensemble"]): a for a in self._TROP().load()}
 
     @staticmethod
-    def _remove_lev(arr: xr.DataArray) -> xr.DataArray:
-        return arr.sum(dim="lev")
+    def _load(finder: FindFiles) -> list[xr.DataArray]:
+        return finder.load()
 
     def ens2median(self, arr: list[xr.DataArray]) -> xr.DataArray:
-        """Combine a list of arrays from different (known) ensembles into a median."""
+        """Combine a list of arrays from different (known) ensembles into a median.
+
+        The shifted arrays, and the TROP_P fields of the same simulations, are cut to
+        16 years before anything is computed. The troposphere is then masked out, and
+        the global mean and sum over levels are done in one pass over each file.
+        """
+        trop_p = [self._trop_p[a.attrs["sim"], a.attrs["ensemble"]] for a in arr]
         arr = vbm.shift_arrays(arr, daily=False)
         # arr = vbm.shift_arrays(arr, custom=1, daily=False)
-        arr = vbm.mean_flatten(arr, dims=["lat", "lon"])
-        arr = vbm.data_array_operation(arr, self._remove_lev)
+        trop_p = vbm.shift_arrays(trop_p, daily=False)
+        cut = slice(12 * 16)
+        arr = [
+            core.utils.time_series.global_column_sum(
+                core.utils.vertical.stratosphere(a.isel(time=cut), t.isel(time=cut))
+            )
+            .compute()
+            .assign_attrs(a.attrs)
+            for a, t in zip(arr, trop_p, strict=True)
+        ]
         arr_ = vbm.get_median(arr, xarray=True)
-        arr_ = arr_[: int(12 * 16)]
         return arr_.assign_coords(time=vbm.dt2float(arr_.time.data) - 1850)
 
     def print_available(self) -> None:
@@ -169,24 +215,25 @@ class OHPlot:
     def compute(self) -> xr.Dataset:
         """Compute the global stratospheric mean OH for all simulations."""
         e2m = self.ens2median
+        load = self._load
         attrs = {"plot_c": COLOR[0], "plot_ls": "-"}
-        oh_c_xr = e2m(self.oh_c.load()).assign_attrs(**attrs).rename("CONTROL")
+        oh_c_xr = e2m(load(self.oh_c)).assign_attrs(**attrs).rename("CONTROL")
         attrs = {"plot_c": COLOR[1], "plot_ls": "-"}
-        oh_m_xr = e2m(self.oh_m.load()).assign_attrs(**attrs).rename("S26")
+        oh_m_xr = e2m(load(self.oh_m)).assign_attrs(**attrs).rename("S26")
         attrs = {"plot_c": COLOR[2], "plot_ls": "-"}
-        oh_p_xr = e2m(self.oh_p.load()).assign_attrs(**attrs).rename("S400")
+        oh_p_xr = e2m(load(self.oh_p)).assign_attrs(**attrs).rename("S400")
         attrs = {"plot_c": COLOR[3], "plot_ls": "-"}
-        oh_s_xr = e2m(self.oh_s.load()).assign_attrs(**attrs).rename("S1629")
+        oh_s_xr = e2m(load(self.oh_s)).assign_attrs(**attrs).rename("S1629")
         attrs = {"plot_c": COLOR[4], "plot_ls": "-"}
-        oh_e_xr = e2m(self.oh_e.load()).assign_attrs(**attrs).rename("S3000")
+        oh_e_xr = e2m(load(self.oh_e)).assign_attrs(**attrs).rename("S3000")
         attrs = {"plot_c": COLOR[1], "plot_ls": ":"}
-        oh_m2_xr = e2m(self.oh_m2.load()).assign_attrs(**attrs).rename("_S26, 2sep")
+        oh_m2_xr = e2m(load(self.oh_m2)).assign_attrs(**attrs).rename("_S26, 2sep")
         attrs = {"plot_c": COLOR[1], "plot_ls": "--"}
-        oh_m4_xr = e2m(self.oh_m4.load()).assign_attrs(**attrs).rename("_S26, 4sep")
+        oh_m4_xr = e2m(load(self.oh_m4)).assign_attrs(**attrs).rename("_S26, 4sep")
         attrs = {"plot_c": COLOR[2], "plot_ls": ":"}
-        oh_p2_xr = e2m(self.oh_p2.load()).assign_attrs(**attrs).rename("_S400, 2sep")
+        oh_p2_xr = e2m(load(self.oh_p2)).assign_attrs(**attrs).rename("_S400, 2sep")
         attrs = {"plot_c": COLOR[2], "plot_ls": "--"}
-        oh_p4_xr = e2m(self.oh_p4.load()).assign_attrs(**attrs).rename("_S400, 4sep")
+        oh_p4_xr = e2m(load(self.oh_p4)).assign_attrs(**attrs).rename("_S400, 4sep")
         return xr.merge(
             [
                 oh_c_xr,
@@ -240,6 +287,8 @@ class SO2BurdenPlot:
     """Plot the SO2 column burden."""
 
     _SHOW = True
+    _NAME = "so2-burden"
+    _DESCRIPTION = "Global mean SO2 burden."
     FINDER = (
         FindFiles()
         .find("TMSO2", "e_fSST1850", "h0")
@@ -257,6 +306,10 @@ class SO2BurdenPlot:
     oh_p2 = FINDER().keep("tt-2sep", {"ens1", "ens3"})
     oh_p4 = FINDER().keep("tt-4sep", {"ens1", "ens3"})
 
+    @staticmethod
+    def _load(finder: FindFiles) -> list[xr.DataArray]:
+        return finder.load()
+
     @staticmethod
     def ens2median(arr: list[xr.DataArray]) -> xr.DataArray:
         """Combine a list of arrays from different (known) ensembles into a median."""
@@ -279,27 +332,70 @@ class SO2BurdenPlot:
         print(self.oh_p2)
         print(self.oh_p4)
 
+    def lifetimes(self, window: float | None = 2, refine: bool = False) -> xr.Dataset:
+        """Fit the e-folding time of every ensemble member of every simulation.
+
+        Parameters
+        ----------
+        window : float | None
+            Number of years after the peak of each member that is used in the fit.
+        refine : bool
+            Refine the log-linear fits by non-linear least squares.
+
+        Returns
+        -------
+        xr.Dataset
+            The e-folding time `tau` in years, with the amplitude and start of each
+            fit, along a `member` dimension labelled by simulation and ensemble.
+        """
+        members = []
+        for finder in (
+            self.oh_c,
+            self.oh_m,
+            self.oh_p,
+            self.oh_s,
+            self.oh_e,
+            self.oh_m2,
+            self.oh_m4,
+            self.oh_p2,
+            self.oh_p4,
+        ):
+            arrs = self._load(finder)
+            labels = [f"{a.attrs['sim']}-{a.attrs['ensemble']}" for a in arrs]
+            arrs = vbm.shift_arrays(arrs, daily=False)
+            if "lat" in arrs[0].dims:
+                arrs = vbm.mean_flatten(arrs, dims=["lat", "lon"])
+            for arr, label in zip(arrs, labels, strict=True):
+                time = vbm.dt2float(arr.time.data) - 1850
+                member = arr.compute().assign_coords(time=time)
+                members.append(member.expand_dims(member=[label]))
+        stacked = xr.concat(members, dim="member", join="outer")
+        return core.utils.time_series.fit_exp_decay(
+            stacked, window=window, refine=refine
+        )
+
     def compute(self) -> xr.Dataset:
         """Compute the global mean TMSO2 for all simulations."""
         e2m = self.ens2median
+        load = self._load
         attrs = {"plot_ls": "-", "plot_c": COLOR[0]}
-        oh_c_xr = e2m(self.oh_c.load()).assign_attrs(**attrs).rename("CONTROL")
+        oh_c_xr = e2m(load(self.oh_c)).assign_attrs(**attrs).rename("CONTROL")
         attrs = {"plot_c": COLOR[1], "plot_ls": "-"}
-        oh_m_xr = e2m(self.oh_m.load()).assign_attrs(**attrs).rename("S26")
+        oh_m_xr = e2m(load(self.oh_m)).assign_attrs(**attrs).rename("S26")
         attrs = {"plot_c": COLOR[2], "plot_ls": "-"}
-        oh_p_xr = e2m(self.oh_p.load()).assign_attrs(**attrs).rename("S400")
+        oh_p_xr = e2m(load(self.oh_p)).assign_attrs(**attrs).rename("S400")
         attrs = {"plot_c": COLOR[3], "plot_ls": "-"}
-        oh_s_xr = e2m(self.oh_s.load()).assign_attrs(**attrs).rename("S1629")
+        oh_s_xr = e2m(load(self.oh_s)).assign_attrs(**attrs).rename("S1629")
         attrs = {"plot_c": COLOR[4], "plot_ls": "-"}
-        oh_e_xr = e2m(self.oh_e.load()).assign_attrs(**attrs).rename("S3000")
+        oh_e_xr = e2m(load(self.oh_e)).assign_attrs(**attrs).rename("S3000")
         attrs = {"plot_c": COLOR[1], "plot_ls": ":"}
-        oh_m2_xr = e2m(self.oh_m2.load()).assign_attrs(**attrs).rename("_S26, 2sep")
+        oh_m2_xr = e2m(load(self.oh_m2)).assign_attrs(**attrs).rename("_S26, 2sep")
         attrs = {"plot_c": COLOR[1], "plot_ls": "--"}
-        oh_m4_xr = e2m(self.oh_m4.load()).assign_attrs(**attrs).rename("_S26, 4sep")
+        oh_m4_xr = e2m(load(self.oh_m4)).assign_attrs(**attrs).rename("_S26, 4sep")
         attrs = {"plot_c": COLOR[2], "plot_ls": ":"}
-        oh_p2_xr = e2m(self.oh_p2.load()).assign_attrs(**attrs).rename("_S400, 2sep")
+        oh_p2_xr = e2m(load(self.oh_p2)).assign_attrs(**attrs).rename("_S400, 2sep")
         attrs = {"plot_c": COLOR[2], "plot_ls": "--"}
-        oh_p4_xr = e2m(self.oh_p4.load()).assign_attrs(**attrs).rename("_S400, 4sep")
+        oh_p4_xr = e2m(load(self.oh_p4)).assign_attrs(**attrs).rename("_S400, 4sep")
         return xr.merge(
             [
                 oh_c_xr,
@@ -316,11 +412,11 @@ class SO2BurdenPlot:
 
     def load(self) -> xr.Dataset:
         """Get or generate the data as a xarray data set."""
-        file = SAVE_PATH / "so2-burden.nc"
+        file = SAVE_PATH / f"{self._NAME}.nc"
         if file.exists():
             return xr.load_dataset(file)
         self._SHOW = False
-        ds = self.compute().assign_attrs(dict(description="Global mean SO2 burden."))
+        ds = self.compute().assign_attrs(dict(description=self._DESCRIPTION))
         ds.to_netcdf(file)
         return ds
 
@@ -333,12 +429,50 @@ class SO2BurdenPlot:
             s.plot(label=name, color=s.plot_c, ls=s.plot_ls)  # type: ignore[call-arg]
         plt.legend()
         plt.xlabel("Time after first eruption [yr]")
-        plt.savefig(SAVE_PATH / "so2-burden")
+        plt.savefig(SAVE_PATH / self._NAME)
         if self._SHOW:
             plt.show()
         plt.close("all")
 
 
-ReffPlot().plot()
-SO2BurdenPlot().plot()
-OHPlot().plot()
+class SO4BurdenPlot(SO2BurdenPlot):
+    """Plot the sulfate aerosol burden, summed over all modes.
+
+    The burden is integrated from the so4_a1/a2/a3 mixing ratios of the same
+    simulations as the SO2 burden, and each simulation is cached on its own.
+    """
+
+    _NAME = "so4-burden"
+    _DESCRIPTION = "Global SO4 aerosol burden in Tg."
+
+    @staticmethod
+    def _load(finder: FindFiles) -> list[xr.DataArray]:
+        # The simulation and ensemble are read from the matched file names, so the
+        # TMSO2 files are not opened, and the so4 files are found in the same index.
+        groups = list(finder.regex.groups.values())
+        out = []
+        for file in finder.get_files().unwrap():
+            meta = dict(zip(groups, file, strict=True))
+            sim, ens = meta["sim"], meta["ensemble"]
+            burden = core.utils.vertical.ColumnBurden.so4(sim, ens, index=finder)
+            out.append(burden.load(f"so4-burden-{sim}-{ens}"))
+        return out
+
+    @staticmethod
+    def ens2median(arr: list[xr.DataArray]) -> xr.DataArray:
+        """Combine a list of arrays from different (known) ensembles into a median."""
+        arr = vbm.shift_arrays(arr, daily=False)
+        arr_ = vbm.get_median(arr, xarray=True)
+        arr_ = arr_[: int(12 * 10)]
+        return arr_.assign_coords(time=vbm.dt2float(arr_.time.data) - 1850)
+
+
+def main(show_output: bool = False) -> None:
+    """Run the main program."""
+    for plot in (ReffPlot(), SO2BurdenPlot(), SO4BurdenPlot(), OHPlot()):
+        plot._SHOW = show_output
+        plot.plot()
+
+
+if __name__ == "__main__":
+    main(show_output=True)
@@ -1,5 +1,5 @@
 """Initialize the utils module."""
 
-from paper1_code.utils import if_save, misc, reff, time_series
+from paper1_code.utils import if_save, misc, pyramid, reff, time_series, vertical
 
-__all__ = ["if_save", "misc", "reff", "time_series"]
+__all__ = ["if_save", "misc", "pyramid", "reff", "time_series", "vertical"]
@@ -0,0 +1,184 @@
+"""Multi-resolution min/max pyramid for plotting long series.
+
+A daily series over a thousand years has hundreds of thousands of points, while a
+figure is only a few thousand pixels wide. The pyramid holds the minimum, maximum and
+mean of the series in bins of ``2**k`` samples for every level ``k``, so a plot only
+needs the level where each bin covers about one pixel. Drawing a line through the
+minimum and maximum of every bin gives the same picture as drawing all points.
+"""
+
+from typing import Self
+
+import cftime
+import matplotlib as mpl
+import numpy as np
+import numpy.typing as npt
+import xarray as xr
+
+import paper1_code as core
+
+
+class MinMaxPyramid:
+    """Minimum, maximum and mean of a series in bins of ``2**k`` samples.
+
+    Parameters
+    ----------
+    x : npt.ArrayLike
+        The increasing x-axis values of the series.
+    y : npt.ArrayLike
+        The series. Missing values (NaN) are ignored.
+    min_bins : int
+        Levels are added until a level has at most this many bins.
+
+    Examples
+    --------
+    >>> pyramid = MinMaxPyramid(np.arange(8.0), [0, 3, 1, 2, 5, 4, 7, 6], min_bins=1)
+    >>> pyramid.levels[1]["max"]
+    array([3., 2., 5., 7.])
+    >>> pyramid.level(0, 8, width=2)
+    2
+    """
+
+    def __init__(
+        self, x: npt.ArrayLike, y: npt.ArrayLike, min_bins: int = 1024
+    ) -> None:
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        valid = ~np.isnan(y)
+        level = {
+            "x": self.x,
+            "min": y,
+            "max": y,
+            "sum": np.where(valid, y, 0.0),
+            "count": valid.astype(float),
+        }
+        self.levels = [level]
+        while len(level["x"]) > min_bins:
+            level = self._coarsen(level)
+            self.levels.append(level)
+
+    @classmethod
+    def from_dataarray(
+        cls, arr: xr.DataArray, dim: str = "time", min_bins: int = 1024
+    ) -> Self:
+        """Create a pyramid from a one dimensional DataArray.
+
+        A datetime-like coordinate is converted to floats with
+        `core.utils.time_series.dt2float`.
+        """
+        x = arr[dim].data
+        if isinstance(x[0], cftime.datetime):
+            x = np.asarray(core.utils.time_series.dt2float(x))
+        return cls(x, arr.data, min_bins)
+
+    @staticmethod
+    def _coarsen(level: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """Combine every two bins of a level into one."""
+        n = len(level["x"])
+        out = {}
+        for key, reduce, pad in (
+            ("min", np.fmin, np.nan),
+            ("max", np.fmax, np.nan),
+            ("sum", np.add, 0.0),
+            ("count", np.add, 0.0),
+        ):
+            # Padding makes the last bin of an odd level hold only its last element.
+            v = np.r_[level[key], pad] if n % 2 else level[key]
+            out[key] = reduce(v[0::2], v[1::2])
+        out["x"] = level["x"][0::2]
+        return out
+
+    def __len__(self) -> int:
+        """Return the number of levels."""
+        return len(self.levels)
+
+    def mean(self, k: int) -> np.ndarray:
+        """Return the mean of every bin on level `k`."""
+        level = self.levels[k]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return level["sum"] / level["count"]
+
+    def level(self, start: float, stop: float, width: int) -> int:
+        """Return the finest level with at most `width` bins between `start` and `stop`.
+
+        Parameters
+        ----------
+        start : float
+            The left edge of the visible range.
+        stop : float
+            The right edge of the visible range.
+        width : int
+            The number of bins wanted, usually the width of the axes in pixels.
+
+        Returns
+        -------
+        int
+            The level.
+        """
+        n = np.searchsorted(self.x, stop, "right") - np.searchsorted(self.x, start)
+        k = int(np.ceil(np.log2(max(n, 1) / max(width, 1))))
+        return min(max(k, 0), len(self) - 1)
+
+    def query(
+        self, start: float, stop: float, width: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the points to draw between `start` and `stop` at a given width.
+
+        The minimum and maximum of every bin are interleaved, so a line through the
+        points covers the full range of the series within each bin.
+
+        Parameters
+        ----------
+        start : float
+            The left edge of the visible range.
+        stop : float
+            The right edge of the visible range.
+        width : int
+            The width of the axes in pixels.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The x and y values of the points. One bin on each side of the range is
+            included, so the line continues to the edges of the axes.
+        """
+        k = self.level(start, stop, width)
+        level = self.levels[k]
+        lo = max(np.searchsorted(level["x"], start) - 1, 0)
+        hi = np.searchsorted(level["x"], stop, "right") + 1
+        x = level["x"][lo:hi]
+        if k == 0:
+            return x, level["min"][lo:hi]
+        y = np.stack((level["min"][lo:hi], level["max"][lo:hi]), axis=1)
+        return np.repeat(x, 2), y.ravel()
+
+
+def plot(
+    ax: mpl.axes.Axes, pyramid: MinMaxPyramid, **kwargs: object
+) -> mpl.lines.Line2D:
+    """Plot a series from its pyramid, updating the level when the x-limits change.
+
+    Parameters
+    ----------
+    ax : mpl.axes.Axes
+        The axes to plot in.
+    pyramid : MinMaxPyramid
+        The pyramid of the series.
+    **kwargs : object
+        Keyword arguments passed on to `ax.plot`.
+
+    Returns
+    -------
+    mpl.lines.Line2D
+        The line, whose data is replaced when the axes are zoomed or panned.
+    """
+    start, stop = pyramid.x[0], pyramid.x[-1]
+    (line,) = ax.plot(*pyramid.query(start, stop, int(ax.bbox.width)), **kwargs)
+    ax.set_xlim(start, stop)
+
+    def _update(ax: mpl.axes.Axes) -> None:
+        start, stop = sorted(ax.get_xlim())
+        line.set_data(*pyramid.query(start, stop, int(ax.bbox.width)))
+
+    ax.callbacks.connect("xlim_changed", _update)
+    return line
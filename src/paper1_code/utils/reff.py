@@ -8,52 +8,16 @@ A.
      ensemble. DOI: 10.5194/acp-21-3317-2021
 """
 
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+import dask
 import numpy as np
 import volcano_base
 import xarray as xr
 
-# fmt: off
-ILEV = [
-    4.50049997269275e-06, 7.42010008991656e-06, 1.22337002750328e-05, 2.01700007806949e-05,
-    3.32545013748131e-05, 5.48274989853326e-05, 9.03979966437873e-05, 0.000149040005226198,
-    0.000245720002567396, 0.000405125007318929, 0.000667940014409396, 0.00110126495656004,
-    0.00181564996637462, 0.00299349994747899, 0.00496299981023185, 0.00815065141068771,
-    0.0134769998112461, 0.0223189999815077, 0.0367965003533754, 0.060664999182336,
-    0.0991565029835328, 0.157389993546531, 0.238849999732338, 0.34520000917837,
-    0.475134991575032, 0.631804985459894, 0.829154974780977, 1.08274002559483,
-    1.40684994403273, 1.81885005440563, 2.33979988843203, 2.99505004659295,
-    3.81470005959272, 4.83444985002279, 6.09635002911091, 7.64934998005629,
-    9.55010019242764, 11.8640000000596, 14.6655002608895, 18.0380009114742,
-    22.0755003392696, 26.8824994564056, 32.5734987854958, 39.2730012536049,
-    47.1144989132881, 56.2404990196228, 66.8004974722862, 80.7014182209969,
-    94.9410423636436, 111.69321089983, 131.401270627975, 154.586806893349,
-    181.863352656364, 213.952820748091, 251.704417169094, 296.117216348648,
-    348.366588354111, 409.83521938324, 482.149928808212, 567.22442060709,
-    652.332969009876, 730.445891618729, 796.363070607185, 845.353666692972,
-    873.715866357088, 900.324631482363, 924.964462406933, 947.432334534824,
-    967.538624536246, 985.112190246582, 1000,
-]
-LEV = [
-    5.96030003130466e-06, 9.82690018247467e-06, 1.62018505278638e-05, 2.6712251077754e-05,
-    4.40410001800728e-05, 7.261274781456e-05, 0.000119719000934992, 0.000197380003896797,
-    0.000325422504943162, 0.000536532510864163, 0.00088460248548472, 0.00145845746146733,
-    0.00240457495692681, 0.00397824987885542, 0.00655682561045978, 0.0108138256109669,
-    0.0178979998963769, 0.0295577501674416, 0.0487307497678557, 0.0799107510829344,
-    0.128273248265032, 0.198119996639434, 0.292025004455354, 0.410167500376701,
-    0.553469988517463, 0.730479980120435, 0.955947500187904, 1.24479498481378,
-    1.61284999921918, 2.07932497141883, 2.66742496751249, 3.40487505309284,
-    4.32457495480776, 5.46539993956685, 6.8728500045836, 8.59972508624196,
-    10.7070500962436, 13.2647501304746, 16.3517505861819, 20.0567506253719,
-    24.4789998978376, 29.7279991209507, 35.9232500195503, 43.1937500834465,
-    51.6774989664555, 61.5204982459545, 73.7509578466415, 87.8212302923203,
-    103.317126631737, 121.547240763903, 142.994038760662, 168.225079774857,
-    197.908086702228, 232.828618958592, 273.910816758871, 322.241902351379,
-    379.100903868675, 445.992574095726, 524.687174707651, 609.778694808483,
-    691.389430314302, 763.404481112957, 820.858368650079, 859.53476652503,
-    887.020248919725, 912.644546944648, 936.198398470879, 957.485479535535,
-    976.325407391414, 992.556095123291,
-]
-# fmt: on
+from paper1_code.utils.vertical import layer_thickness, stratosphere
 
 
 class Reff:
@@ -67,6 +31,13 @@ class Reff:
         The 3D temperature in kelvin (K) (`T`).
     sad : xr.DataArray
         The 3D aerosol surface area density in cm2/cm3 (`SAD_AERO`).
+    per_grid_cell : bool
+        If True, the 4D fields are kept as they are and the products in equation A3
+        are formed in every grid cell before they are area weighted and summed.
+        Otherwise (default) each field is first averaged over lat/lon.
+    time_chunk : int
+        With `per_grid_cell`, the fields are chunked by this many time steps so that
+        the numerator and denominator are reduced together, one chunk at a time.
 
     Examples
     --------
@@ -94,25 +65,53 @@ class Reff:
     >>> # reff.to_netcdf("reff.nc")
     >>> reff.plot()
     >>> plt.show()
+
+    Area weighting the products in every grid cell instead of the fields, while only
+    holding twelve months of the 4D fields in memory at a time:
+
+    >>> reff = Reff(r1, t1, s1, per_grid_cell=True, time_chunk=12).calculate_reff()
     """
 
     def __init__(
-        self, reff: xr.DataArray, temp: xr.DataArray, sad: xr.DataArray
+        self,
+        reff: xr.DataArray,
+        temp: xr.DataArray,
+        sad: xr.DataArray,
+        per_grid_cell: bool = False,
+        time_chunk: int = 12,
     ) -> None:
+        self._per_grid_cell = per_grid_cell
+        if per_grid_cell:
+            reff, temp, sad = self._chunk_by_time(
+                reff, temp, sad, time_chunk=time_chunk
+            )
+        else:
+            reff = self._flatten_if_3d(reff).assign_attrs(reff.attrs)
+            temp = self._flatten_if_3d(temp)
+            sad = self._flatten_if_3d(sad)
         # Convert from cm to µm
-        self.reff = (self._flatten_if_3d(reff) * 10_000).assign_attrs(reff.attrs)
-        self.temp = self._flatten_if_3d(temp)
-        self.sad = self._flatten_if_3d(sad)
+        self.reff = (reff * 10_000).assign_attrs(reff.attrs)
+        self.temp = temp
+        self.sad = sad
         self.h = self._calculate_h()
         self.coeff = self.sad * self.h
 
+    @staticmethod
+    def _chunk_by_time(
+        *arrs: xr.DataArray, time_chunk: int
+    ) -> tuple[xr.DataArray, ...]:
+        """Align the fields and give them the same lazy chunks along time only."""
+        aligned = xr.align(*arrs, join="exact")
+        chunks = {"time": time_chunk, "lev": -1, "lat": -1, "lon": -1}
+        return tuple(arr.chunk(chunks) for arr in aligned)
+
     def _calculate_h(self) -> xr.DataArray:
         r"""Calculate the vertical thickness.
 
         Returns
         -------
         h : xr.DataArray
-            The vertical layer thickness at each vertical coordinate.
+            The vertical layer thickness at each time and vertical coordinate.
 
         Notes
         -----
@@ -124,14 +123,12 @@ class Reff:
 
         where :math:`R` is the dry air gas constant, :math:`g` is acceleration due to
         gravity at sea level, and :math:`T` is the average temperature of the layer
-        between pressure levels :math:`P_2<P_1`.
+        between pressure levels :math:`P_1<P_2`. See
+        `core.utils.vertical.layer_thickness`, which also handles fields that only
+        hold a subset of the levels (such as the stratospheric levels from
+        `core.utils.vertical.stratosphere`).
         """
-        dry_air_gas_const = 287  # J kg^-1 K^-1
-        g = 9.81  # m s^-2
-        for p1, p2, temp_2d in zip(ILEV[1:], ILEV[:-1], self.temp.T, strict=True):
-            # p1 is closest to the surface (higher pressure) than p2. Both go top-down.
-            h: xr.DataArray = dry_air_gas_const * temp_2d / g * np.log(p2 / p1)
-        return h.compute()
+        return layer_thickness(self.temp)
 
     def _flatten_if_3d(self, arr: xr.DataArray) -> xr.DataArray:
         """If the input arrays include lat/lon coordinates, average them out."""
@@ -161,8 +158,146 @@ class Reff:
             {\sum_{\tau=\tau_1} (\text{SAD}\cdot h)_{\tau}}
 
         where :math:`\{text{SAD}}` is the surface aerosol density, and :math:`h` is the
-        vertical layer thickness in meters from A1/`self._calculate_h`.
+        vertical layer thickness in meters from A1/`self._calculate_h`. With
+        `per_grid_cell`, the sums also run over all grid cells, weighted by their area.
+        The result is then lazy, and computing it reads each time chunk of the three
+        fields once.
         """
         num = self.coeff * self.reff
-        reff = num.sum(dim="lev") / self.coeff.sum(dim="lev")
+        if not self._per_grid_cell:
+            reff = num.sum(dim="lev") / self.coeff.sum(dim="lev")
+            return reff.assign_attrs(self.reff.attrs)
+        weights = np.cos(np.deg2rad(self.coeff.lat))
+        dims = ["lev", "lat", "lon"]
+        reff = num.weighted(weights).sum(dims) / self.coeff.weighted(weights).sum(dims)
         return reff.assign_attrs(self.reff.attrs)
+
+
+_VARS = ("REFF_AERO", "T", "SAD_AERO", "TROP_P")
+
+
+def _open(field: xr.DataArray | os.PathLike | str, var: str) -> xr.DataArray:
+    """Open the variable `var` of a file lazily, or return an array as it is."""
+    if isinstance(field, xr.DataArray):
+        return field
+    return xr.open_dataset(field, chunks={})[var]
+
+
+def _reff_worker(
+    fields: tuple[xr.DataArray | os.PathLike | str, ...], kwargs: dict
+) -> xr.DataArray:
+    """Compute the effective radius of one simulation inside a worker process."""
+    # Each process is one worker, so dask should not spawn threads of its own.
+    with dask.config.set(scheduler="synchronous"):
+        reff, temp, sad, *trop_p = (
+            _open(field, var) for field, var in zip(fields, _VARS, strict=False)
+        )
+        if trop_p:
+            top = float(trop_p[0].max())
+            reff, temp, sad = (
+                stratosphere(arr, trop_p[0], max_trop_p=top)
+                for arr in (reff, temp, sad)
+            )
+        return Reff(reff, temp, sad, **kwargs).calculate_reff().compute()
+
+
+def _label(field: xr.DataArray | os.PathLike | str, i: int) -> str:
+    if not isinstance(field, xr.DataArray):
+        return pathlib.Path(field).stem
+    if {"sim", "ensemble"} <= set(field.attrs):
+        return f"{field.attrs['sim']}-{field.attrs['ensemble']}"
+    return str(i)
+
+
+def calculate_reff_batch(
+    reff: list[xr.DataArray] | list[os.PathLike | str] | xr.Dataset,
+    temp: list[xr.DataArray] | list[os.PathLike | str] | None = None,
+    sad: list[xr.DataArray] | list[os.PathLike | str] | None = None,
+    trop_p: list[xr.DataArray] | list[os.PathLike | str] | None = None,
+    max_workers: int | None = None,
+    **kwargs,
+) -> xr.Dataset:
+    """Compute the effective radius of many simulations in parallel.
+
+    The fields are sent to the worker processes as they are given, so they should be
+    lazy (dask backed) arrays or paths to the files. Each worker then only reads the
+    chunks of its own simulation. A path is opened lazily by the worker, and the
+    variable is picked by its name.
+
+    Parameters
+    ----------
+    reff : list[xr.DataArray] | list[os.PathLike | str] | xr.Dataset
+        The aerosol effective radius of each simulation (`REFF_AERO`), or a dataset
+        with the variables `REFF_AERO`, `T` and `SAD_AERO` stacked along a `sim`
+        dimension.
+    temp : list[xr.DataArray] | list[os.PathLike | str] | None
+        The temperature of each simulation (`T`), matched with `reff`. Not used if
+        `reff` is a dataset.
+    sad : list[xr.DataArray] | list[os.PathLike | str] | None
+        The aerosol surface area density of each simulation (`SAD_AERO`), matched
+        with `reff`. Not used if `reff` is a dataset.
+    trop_p : list[xr.DataArray] | list[os.PathLike | str] | None
+        The tropopause pressure of each simulation (`TROP_P`), matched with `reff`.
+        If given, only the stratospheric grid cells enter the effective radius. For a
+        dataset input, its `TROP_P` variable is used if present.
+    max_workers : int | None
+        Number of worker processes. Default is one per CPU.
+    **kwargs
+        Keyword arguments passed on to `Reff`, such as `per_grid_cell`.
+
+    Returns
+    -------
+    xr.Dataset
+        A dataset with the variable `reff` along the dimensions `sim` and `time`.
+        The `sim` labels are built from the `sim` and `ensemble` attributes set by
+        `volcano_base.load.FindFiles`, which are also kept as the `case` and
+        `ensemble` coordinates. Paths are labelled by their file name, without
+        ensemble. Time axes that differ are outer joined.
+
+    Raises
+    ------
+    ValueError
+        If the lists of fields do not have the same length.
+
+    Examples
+    --------
+    >>> FINDER = (
+    ...     volcano_base.load.FindFiles()
+    ...     .find({"ens1", "ens3"}, {"tt-2sep", "tt-4sep", "medium-2sep", "medium-4sep"})
+    ...     .sort("ensemble", "sim")
+    ...     .copy
+    ... )
+    >>> ds = calculate_reff_batch(
+    ...     FINDER().keep("REFF_AERO").load(),
+    ...     FINDER().keep("T").load(),
+    ...     FINDER().keep("SAD_AERO").load(),
+    ...     trop_p=FINDER().keep("TROP_P").load(),
+    ... )
+    >>> ds.reff.where(ds.case == "tt-2sep", drop=True)
+    """
+    if isinstance(reff, xr.Dataset):
+        ds = reff
+        n = ds.sizes["sim"]
+        reff = [ds.REFF_AERO.isel(sim=i) for i in range(n)]
+        temp = [ds["T"].isel(sim=i) for i in range(n)]
+        sad = [ds.SAD_AERO.isel(sim=i) for i in range(n)]
+        if "TROP_P" in ds:
+            trop_p = [ds.TROP_P.isel(sim=i) for i in range(n)]
+        labels = [str(label) for label in ds.sim.data]
+    elif temp is None or sad is None or not len(reff) == len(temp) == len(sad):
+        raise ValueError("The reff, temp and sad lists must be of equal length.")
+    elif trop_p is not None and len(trop_p) != len(reff):
+        raise ValueError("The trop_p list must be as long as the reff list.")
+    else:
+        labels = [_label(r, i) for i, r in enumerate(reff)]
+    attrs = [r.attrs if isinstance(r, xr.DataArray) else {} for r in reff]
+    cases = [a.get("sim", label) for a, label in zip(attrs, labels, strict=True)]
+    ensembles = [a.get("ensemble", "") for a in attrs]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        fields = zip(reff, temp, sad, *([trop_p] if trop_p else []), strict=True)
+        out = list(pool.map(_reff_worker, fields, [kwargs] * len(reff)))
+    stacked = xr.concat(out, dim="sim", join="outer", coords="minimal")
+    stacked = stacked.assign_coords(
+        sim=labels, case=("sim", cases), ensemble=("sim", ensembles)
+    )
+    return stacked.rename("reff").to_dataset()
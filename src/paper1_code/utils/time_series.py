@@ -1,8 +1,9 @@
 """Functions that modify (lists of) xarray DataArrays."""
 
+import functools
 import os
 from collections import Counter
-from typing import Literal, overload
+from typing import Literal, Self, overload
 
 import cftime
 import matplotlib.pyplot as plt
@@ -11,6 +12,15 @@ import numpy.typing as npt
 import scipy
 import xarray as xr
 
+import paper1_code as core
+
+LATITUDE_BANDS: dict[str, tuple[float, float]] = {
+    "global": (-90, 90),
+    "tropics": (-30, 30),
+    "nh-extratropics": (30, 90),
+    "sh-extratropics": (-90, -30),
+}
+
 
 @overload
 def convert_aod(aod: xr.DataArray) -> xr.DataArray: ...
@@ -106,6 +116,33 @@ def shift_arrays(
     return list(xr.align(*array))
 
 
+def as_precision(arr: xr.DataArray) -> xr.DataArray:
+    """Cast a floating point array to the precision set in `config.PRECISION`.
+
+    Only float32 is enforced, since float64 is what the reductions fall back to
+    anyway.
+    """
+    if (
+        core.config.PRECISION == "float32"
+        and np.issubdtype(arr.dtype, np.floating)
+        and arr.dtype != np.float32
+    ):
+        return arr.astype(np.float32)
+    return arr
+
+
+def _reduce(
+    arr: xr.DataArray, operation: Literal["mean", "sum"], dims: list[str]
+) -> xr.DataArray:
+    """Reduce over ``dims``, accumulating in float64 when running in float32."""
+    if core.config.PRECISION == "float32" and arr.dtype == np.float32:
+        # The accumulator is float64, but only the small result is kept as such
+        # before being cast back.
+        out: xr.DataArray = getattr(arr, operation)(dim=dims, dtype=np.float64)
+        return out.astype(np.float32)
+    return getattr(arr, operation)(dim=dims)
+
+
 def _latitude_mean(
     arr: xr.DataArray, lat: str, operation: Literal["mean", "sum"] = "mean"
 ) -> xr.DataArray:
@@ -113,6 +150,14 @@ def _latitude_mean(
     lats = getattr(arr, lat)
     weights = np.cos(np.deg2rad(lats))
     weights.name = "weights"
+    if core.config.PRECISION == "float32" and arr.dtype == np.float32:
+        # Float64 weights would promote the full field to float64, so the weights
+        # are cast down and only the sums over latitude are float64.
+        out = _reduce(arr * weights.astype(np.float32), "sum", [lat])
+        if operation == "sum":
+            return out
+        sum_of_weights = xr.dot(arr.notnull(), weights, dim=lat)
+        return (out / sum_of_weights).astype(np.float32)
     return getattr(arr.weighted(weights), operation)(lat)
 
 
@@ -158,6 +203,11 @@ def mean_flatten(
     -------
     list[xr.DataArray] | xr.DataArray
         A list of averaged xarray Data Arrays.
+
+    Notes
+    -----
+    If `config.PRECISION` is "float32", the arrays are cast to float32 and the sums
+    over ``dims`` are accumulated in float64.
     """
     if dims is None:
         dims = ["lon", "time"]
@@ -171,28 +221,118 @@ def mean_flatten(
         include_lat = True
     match arrays:
         case xr.DataArray():
+            arrays = as_precision(arrays)
             if include_lat:
                 tmp = _latitude_mean(arrays, lat, operation=operation)
                 arrays = tmp.assign_attrs(arrays.attrs)
                 tmp.close()
-            arrays_: xr.DataArray = getattr(arrays, operation)(dim=dims)
+            arrays_ = _reduce(arrays, operation, dims)
             arrays_ = arrays_.assign_attrs(arrays_.attrs)
             return arrays_
     array = arrays[:]
     for i, arr in enumerate(array):
         if include_lat:
-            tmp = _latitude_mean(arr, lat, operation=operation)
+            tmp = _latitude_mean(as_precision(arr), lat, operation=operation)
             arr_ = tmp.assign_attrs(arr.attrs)
             tmp.close()
         else:
-            arr_ = arr
-        array[i] = getattr(arr_, operation)(dim=dims)
+            arr_ = as_precision(arr)
+        array[i] = _reduce(arr_, operation, dims)
         array[i] = array[i].assign_attrs(arr_.attrs)
         arr.close()
         arr_.close()
     return array
 
 
+@functools.lru_cache(maxsize=16)
+def _band_weights(
+    lats: tuple[float, ...], bands: tuple[tuple[float, float], ...]
+) -> np.ndarray:
+    """Return the cos(lat) weights of each band, cached per grid and set of bands."""
+    lat = np.asarray(lats)
+    inside = np.array([(lat >= south) & (lat <= north) for south, north in bands])
+    return inside * np.cos(np.deg2rad(lat))
+
+
+def zonal_band_means(
+    arr: xr.DataArray,
+    bands: dict[str, tuple[float, float]] | None = None,
+    lat: str = "lat",
+    lon: str = "lon",
+) -> xr.Dataset:
+    """Compute the zonal mean and the area weighted mean of latitude bands.
+
+    The band means are weighted sums of the zonal mean, so all of them come out of
+    the same single pass over a lazy field when the returned dataset is computed.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        A field with (at least) the dimensions `lat` and `lon`.
+    bands : dict[str, tuple[float, float]] | None
+        The southern and northern edge of each band, both included. Default is
+        `LATITUDE_BANDS`.
+    lat : str
+        Name of the latitude dimension.
+    lon : str
+        Name of the longitude dimension.
+
+    Returns
+    -------
+    xr.Dataset
+        The (time, lat) Hovmöller as `zonal_mean`, and the means of the bands along
+        a `band` dimension as `band_mean`.
+
+    Examples
+    --------
+    >>> ds = zonal_band_means(aod).compute()
+    >>> ds.band_mean.sel(band="tropics").plot()
+    >>> ds.zonal_mean.plot(x="time")
+    """
+    bands = LATITUDE_BANDS if bands is None else bands
+    zonal = arr.mean(lon)
+    weights = _band_weights(
+        tuple(arr[lat].data.tolist()), tuple(tuple(b) for b in bands.values())
+    )
+    weights_ = xr.DataArray(weights, dims=["band", lat], coords={"band": list(bands)})
+    num = xr.dot(zonal.fillna(0), weights_, dim=lat)
+    band = num / xr.dot(zonal.notnull(), weights_, dim=lat)
+    return xr.Dataset({"zonal_mean": zonal, "band_mean": band}, attrs=arr.attrs)
+
+
+def global_column_sum(
+    arr: xr.DataArray, lev: str = "lev", lat: str = "lat", lon: str = "lon"
+) -> xr.DataArray:
+    """Sum over levels of the area weighted global mean on each level.
+
+    This is the same as `mean_flatten` over lat/lon followed by a sum over `lev`, but
+    the numerator and the sum of weights are both reductions of the input field, so a
+    lazy field is read once and no intermediate (time, lev) array is kept per step.
+    Missing values, such as the tropospheric cells masked by
+    `core.utils.vertical.stratosphere`, are left out of the mean on each level.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        A 4D field with the dimensions `lev`, `lat` and `lon`.
+    lev : str
+        Name of the vertical dimension.
+    lat : str
+        Name of the latitude dimension.
+    lon : str
+        Name of the longitude dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        The (lazy, if `arr` is lazy) reduced array.
+    """
+    weights = np.cos(np.deg2rad(arr[lat]))
+    num = xr.dot(arr.fillna(0), weights, dim=[lat, lon])
+    den = xr.dot(arr.notnull(), weights, dim=[lat, lon])
+    return (num / den).sum(lev).assign_attrs(arr.attrs)
+
+
 @overload
 def remove_seasonality(
     arrays: list[xr.DataArray],
@@ -401,7 +541,7 @@ def get_median(
     """
     array = arrays[:]
     x_ax = array[0].time.data
-    y_ax = np.zeros((len(array), len(array[0].data)))
+    y_ax = np.zeros((len(array), len(array[0].data)), dtype=core.config.PRECISION)
     for i, arr in enumerate(array):
         y_ax[i, :] = arr[:].data
     if xarray:
@@ -413,6 +553,210 @@ def get_median(
     return x_ax, np.median(y_ax, axis=0)
 
 
+class QuantileSketch:
+    """Mergeable approximate quantiles of an ensemble, for every time step.
+
+    The sketch is a stack of compactors in the style of Karnin, Lang and Liberty
+    (2016). Level ``h`` holds items of weight ``2**h``, and a level that grows beyond
+    ``k`` items is sorted and every second item is promoted to the next level. All time
+    steps see the same number of members, so the levels are stored as ``(item, time)``
+    arrays and all time steps are compacted at once.
+
+    Parameters
+    ----------
+    k : int
+        Capacity of each level. The sketch is exact as long as it has seen at most
+        ``k`` members, and the rank error shrinks as ``k`` grows.
+    seed : int | None
+        Seed for the random choice of which half of a level is promoted.
+
+    Examples
+    --------
+    Sketches built from different parts of an ensemble combine into the sketch of the
+    full ensemble.
+
+    >>> rng = np.random.default_rng(1)
+    >>> members = rng.normal(size=(10, 5))
+    >>> a = QuantileSketch().update(members[:4])
+    >>> b = QuantileSketch().update(members[4:])
+    >>> np.allclose(a.merge(b).median(), np.median(members, axis=0))
+    True
+    """
+
+    def __init__(self, k: int = 200, seed: int | None = None) -> None:
+        min_k = 2
+        if k < min_k:
+            raise ValueError("The capacity k must be at least 2.")
+        self.k = k
+        self.levels: list[np.ndarray] = []
+        self._compacted_weight = 0
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: list[xr.DataArray], k: int = 200, seed: int | None = None
+    ) -> Self:
+        """Create a sketch from a list of aligned arrays.
+
+        Parameters
+        ----------
+        arrays : list[xr.DataArray]
+            A list of xarray DataArrays with a single time dimension.
+        k : int
+            Capacity of each level.
+        seed : int | None
+            Seed for the random compaction.
+
+        Returns
+        -------
+        QuantileSketch
+            A sketch that has seen all members in ``arrays``.
+        """
+        sketch = cls(k, seed)
+        for arr in arrays:
+            sketch.update(np.asarray(arr.data))
+        return sketch
+
+    @property
+    def count(self) -> int:
+        """Return the number of members the sketch has seen."""
+        return sum(len(level) << h for h, level in enumerate(self.levels))
+
+    @property
+    def rank_error(self) -> float:
+        """Return an upper bound on the rank error, as a fraction of the count.
+
+        Every compaction of level ``h`` moves the rank of any value by at most
+        ``2**h``, so the sum over all compactions bounds the error of a quantile.
+        """
+        return self._compacted_weight / self.count if self.levels else 0.0
+
+    def update(self, values: npt.ArrayLike) -> Self:
+        """Add one member, with shape ``(time,)``, or several, with ``(member, time)``.
+
+        Parameters
+        ----------
+        values : npt.ArrayLike
+            The new members.
+
+        Returns
+        -------
+        QuantileSketch
+            The same sketch, now including the new members.
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        self._insert(0, values)
+        return self
+
+    def merge(self, other: Self) -> Self:
+        """Merge another sketch of the same time steps into this one.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            The sketch to merge in. It is not modified.
+
+        Returns
+        -------
+        QuantileSketch
+            The same sketch, now also including all members seen by ``other``.
+        """
+        self._compacted_weight += other._compacted_weight
+        for h, level in enumerate(other.levels):
+            self._insert(h, level)
+        return self
+
+    def _insert(self, h: int, items: np.ndarray) -> None:
+        while len(self.levels) <= h:
+            self.levels.append(np.empty((0, items.shape[1])))
+        self.levels[h] = np.concatenate((self.levels[h], items))
+        while h < len(self.levels):
+            if len(level := self.levels[h]) > self.k:
+                level = np.sort(level, axis=0)
+                even = len(level) - len(level) % 2
+                offset = self._rng.integers(2)
+                self.levels[h] = level[even:]
+                self._compacted_weight += 1 << h
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty((0, level.shape[1])))
+                promoted = level[offset:even:2]
+                self.levels[h + 1] = np.concatenate((self.levels[h + 1], promoted))
+            h += 1
+
+    def quantile(self, q: float | npt.ArrayLike) -> np.ndarray:
+        """Return the ``q``-th quantile(s) at every time step.
+
+        Parameters
+        ----------
+        q : float | npt.ArrayLike
+            Quantile(s) between 0 and 1.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape ``(time,)`` for a scalar ``q``, or ``(len(q), time)``.
+
+        Raises
+        ------
+        ValueError
+            If the sketch is empty.
+
+        Notes
+        -----
+        As long as no level has been compacted, this is identical to ``np.quantile``.
+        Otherwise, the weighted items are used to find the smallest value whose rank
+        is at least ``q`` times the count.
+        """
+        if not self.levels:
+            raise ValueError("Cannot find quantiles of an empty sketch.")
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q, axis=0)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(level), 1 << h) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(items, axis=0)
+        ranks = np.cumsum(weights[order], axis=0)
+        qs = np.atleast_1d(q)
+        idx = (ranks[None, :, :] < qs[:, None, None] * self.count).sum(axis=1)
+        idx = np.minimum(idx, len(items) - 1)
+        sorted_items = np.take_along_axis(items, order, axis=0)
+        out = np.take_along_axis(sorted_items, idx, axis=0)
+        return out[0] if np.ndim(q) == 0 else out
+
+    def median(self) -> np.ndarray:
+        """Return the median at every time step."""
+        return self.quantile(0.5)
+
+    def save(self, file: str | os.PathLike) -> None:
+        """Save the sketch to an ``.npz`` file, so it can be merged in a later run."""
+        levels = {f"level{h}": level for h, level in enumerate(self.levels)}
+        np.savez(file, k=self.k, compacted_weight=self._compacted_weight, **levels)
+
+    @classmethod
+    def load(cls, file: str | os.PathLike, seed: int | None = None) -> Self:
+        """Load a sketch saved by ``QuantileSketch.save``.
+
+        Parameters
+        ----------
+        file : str | os.PathLike
+            The ``.npz`` file.
+        seed : int | None
+            Seed for the random compaction of the loaded sketch.
+
+        Returns
+        -------
+        QuantileSketch
+            The saved sketch.
+        """
+        with np.load(file) as data:
+            sketch = cls(int(data["k"]), seed)
+            sketch._compacted_weight = int(data["compacted_weight"])
+            n_levels = sum(name.startswith("level") for name in data.files)
+            sketch.levels = [data[f"level{h}"] for h in range(n_levels)]
+        return sketch
+
+
 @overload
 def keep_whole_years(
     arrays: list[xr.DataArray], freq: str = "D"
@@ -546,6 +890,422 @@ def weighted_season_avg(da: xr.DataArray) -> xr.DataArray:
     return obs_sum / ones_out
 
 
+def weighted_season_means(ds: xr.Dataset) -> xr.Dataset:
+    """Calculate seasonal means of all variables in one weighted aggregation.
+
+    This gives the same result as `weighted_season_avg` on every variable and every
+    element along the other dimensions, but all quarters of all variables are found
+    from a single weighted sum over time.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        Dataset with a monthly datetime-like time dimension. All variables must
+        share the same dimensions.
+
+    Returns
+    -------
+    xr.Dataset
+        The seasonal means, with time set to the start of each quarter.
+    """
+    time = ds.time
+    month_length = time.dt.days_in_month.data.astype(float)
+    # Weight by the length of the month, normalised within each season.
+    _, season = np.unique(time.dt.season.data, return_inverse=True)
+    weights = month_length / np.bincount(season, weights=month_length)[season]
+    quarter = time.dt.year.data * 4 + (time.dt.month.data - 1) // 3
+    first = quarter.min()
+    quarters = np.arange(first, quarter.max() + 1)
+    w = np.zeros((len(time), len(quarters)))
+    w[np.arange(len(time)), quarter - first] = weights
+    w = xr.DataArray(w, dims=["time", "quarter"])
+    arr = ds.to_dataarray("variable")
+    num = xr.dot(arr.fillna(0), w, dim="time")
+    den = xr.dot(arr.notnull().astype(float), w, dim="time")
+    labels = [
+        cftime.datetime(q // 4, 3 * (q % 4) + 1, 1, calendar=time.dt.calendar)
+        for q in quarters
+    ]
+    out = (num / den).rename(quarter="time").assign_coords(time=labels)
+    return out.to_dataset("variable")
+
+
+class WindowIndex:
+    """Cumulative-sum index for weighted window means along the time axis.
+
+    The index is built once from a list of aligned members, after which the weighted
+    mean over any window of any member is found from two lookups in the cumulative
+    sums.
+
+    Parameters
+    ----------
+    arrays : list[xr.DataArray] | xr.DataArray
+        Array or a list of aligned arrays with a one dimensional time axis.
+    weights : np.ndarray | None
+        The weight of each time step. Default is the number of days in each month if
+        the time axis is datetime-like, and uniform weights otherwise.
+    days_in_year : int
+        Number of days in the year, used when converting a datetime-like time axis to
+        floats that window edges are compared against.
+
+    Examples
+    --------
+    >>> arr = xr.DataArray(np.arange(24.0), dims="time", coords={"time": np.arange(24) / 12})
+    >>> idx = WindowIndex(arr)
+    >>> idx.mean(0, 1)
+    array([5.5])
+    >>> idx.means([0, 1, 2])
+    array([[ 5.5, 17.5]])
+    """
+
+    def __init__(
+        self,
+        arrays: list[xr.DataArray] | xr.DataArray,
+        weights: np.ndarray | None = None,
+        days_in_year: int = 365,
+    ) -> None:
+        array = [arrays] if isinstance(arrays, xr.DataArray) else arrays[:]
+        time = array[0].time.data
+        if isinstance(time[0], cftime.datetime):
+            self.x = np.asarray(dt2float(time, days_in_year=days_in_year))
+            if weights is None:
+                weights = array[0].time.dt.days_in_month.data
+        else:
+            self.x = np.asarray(time, dtype=float)
+        if weights is None:
+            weights = np.ones(len(time))
+        data = np.asarray([arr.data for arr in array], dtype=float)
+        valid = ~np.isnan(data)
+        w = np.where(valid, np.asarray(weights, dtype=float), 0.0)
+        # A leading zero makes the sum over the slice [i, j) equal to c[j] - c[i].
+        self._cw = np.zeros((len(array), len(time) + 1))
+        self._cwx = np.zeros((len(array), len(time) + 1))
+        np.cumsum(w, axis=1, out=self._cw[:, 1:])
+        np.cumsum(np.where(valid, data, 0.0) * w, axis=1, out=self._cwx[:, 1:])
+
+    def __len__(self) -> int:
+        """Return the number of members in the index."""
+        return len(self._cw)
+
+    def _mean_idx(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """Return the weighted mean over the index slices ``[lo, hi)``."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self._cwx[:, hi] - self._cwx[:, lo]) / (
+                self._cw[:, hi] - self._cw[:, lo]
+            )
+
+    def mean(
+        self, start: float | npt.ArrayLike, stop: float | npt.ArrayLike
+    ) -> np.ndarray:
+        """Return the weighted mean of every member within ``[start, stop)``.
+
+        Parameters
+        ----------
+        start : float | npt.ArrayLike
+            The left (inclusive) window edge(s).
+        stop : float | npt.ArrayLike
+            The right (exclusive) window edge(s).
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape ``(member,)`` for scalar edges, or ``(member, window)`` if
+            the edges are arrays. Empty windows are NaN.
+        """
+        lo = np.searchsorted(self.x, start, side="left")
+        hi = np.searchsorted(self.x, stop, side="left")
+        return self._mean_idx(lo, hi)
+
+    def means(self, edges: npt.ArrayLike) -> np.ndarray:
+        """Return the weighted mean of every member between consecutive edges.
+
+        Parameters
+        ----------
+        edges : npt.ArrayLike
+            Increasing window edges. Window ``k`` covers ``[edges[k], edges[k + 1])``.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape ``(member, len(edges) - 1)``.
+        """
+        idx = np.searchsorted(self.x, edges, side="left")
+        return self._mean_idx(idx[:-1], idx[1:])
+
+    def rolling(self, window: int) -> np.ndarray:
+        """Return the weighted mean over every run of ``window`` consecutive steps.
+
+        Parameters
+        ----------
+        window : int
+            The number of time steps in each window.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape ``(member, time - window + 1)``, where element ``i`` is the
+            mean over the time steps ``i, ..., i + window - 1``.
+        """
+        lo = np.arange(self._cw.shape[1] - window)
+        return self._mean_idx(lo, lo + window)
+
+
+def event_windows(
+    arr: xr.DataArray,
+    events: npt.ArrayLike,
+    pre: int = 0,
+    post: int = 0,
+    dim: str = "time",
+) -> xr.DataArray:
+    """Extract a fixed window around each event from a long series.
+
+    The windows are taken from a strided view of the series, so only the windows
+    themselves are copied.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        The long series.
+    events : npt.ArrayLike
+        The coordinate values along `dim` of the events, for example eruption dates.
+        Events that are not on the coordinate, or whose window is not fully within the
+        series, are dropped.
+    pre : int
+        Number of steps before the event to include in the window.
+    post : int
+        Number of steps after the event to include in the window.
+    dim : str
+        The dimension the windows are taken along.
+
+    Returns
+    -------
+    xr.DataArray
+        Array where `dim` is replaced by an ``event`` dimension (coordinate values are
+        the kept events) followed by a ``lag`` dimension (from ``-pre`` to ``post``).
+
+    Examples
+    --------
+    >>> arr = xr.DataArray(np.arange(10.0), dims="time", coords={"time": np.arange(10)})
+    >>> event_windows(arr, [1, 5, 9], pre=1, post=2).data
+    array([[0., 1., 2., 3.],
+           [4., 5., 6., 7.]])
+    """
+    index = arr.get_index(dim)
+    pos = index.get_indexer(np.atleast_1d(np.asarray(events)))
+    pos = pos[(pos >= pre) & (pos + post < len(index))]
+    axis = arr.get_axis_num(dim)
+    view = np.lib.stride_tricks.sliding_window_view(
+        np.asarray(arr.data), pre + post + 1, axis=axis
+    )
+    dims = [*arr.dims[:axis], "event", *arr.dims[axis + 1 :], "lag"]
+    coords = {k: v for k, v in arr.coords.items() if dim not in v.dims}
+    out = xr.DataArray(
+        np.take(view, pos - pre, axis=axis),
+        dims=dims,
+        coords={
+            **coords,
+            "event": np.asarray(index[pos]),
+            "lag": np.arange(-pre, post + 1),
+        },
+        name=arr.name,
+        attrs=arr.attrs,
+    )
+    return out.transpose("event", "lag", ...)
+
+
+class EventSeries:
+    """Sparse series of events, stored as event times and magnitudes.
+
+    A forcing series that is zero except at a few time steps, such as volcanic
+    eruptions in a daily record, is kept as its events only. Shifting, selecting and
+    aligning work on the events, and windows are taken directly from the dense series
+    the events are compared against.
+
+    Parameters
+    ----------
+    time : npt.ArrayLike
+        The times of the events, for example cftime dates.
+    values : npt.ArrayLike
+        The magnitude of each event.
+    name : str | None
+        Name used when the events are converted to a DataArray.
+
+    Examples
+    --------
+    >>> events = EventSeries([3, 1, 7], [30.0, 10.0, 70.0])
+    >>> events.shift(1).sel(2, 4).values
+    array([10., 30.])
+    """
+
+    def __init__(
+        self, time: npt.ArrayLike, values: npt.ArrayLike, name: str | None = None
+    ) -> None:
+        time = np.atleast_1d(np.asarray(time))
+        order = np.argsort(time, kind="stable")
+        self.time = time[order]
+        self.values = np.atleast_1d(np.asarray(values))[order]
+        self.name = name
+
+    def __len__(self) -> int:
+        """Return the number of events."""
+        return len(self.time)
+
+    @classmethod
+    def from_dense(cls, arr: xr.DataArray, dim: str = "time") -> Self:
+        """Create an event series from the non-zero values of a dense series."""
+        data = np.asarray(arr.data)
+        idx = np.flatnonzero(data)
+        return cls(arr[dim].data[idx], data[idx], name=arr.name)
+
+    def _new(self, time: np.ndarray, values: np.ndarray) -> Self:
+        return type(self)(time, values, name=self.name)
+
+    def shift(self, offset: object) -> Self:
+        """Return the events moved by `offset`, for example a `datetime.timedelta`."""
+        return self._new(self.time + offset, self.values)
+
+    def sel(self, start: object = None, stop: object = None) -> Self:
+        """Return the events between `start` and `stop`, both inclusive."""
+        lo = 0 if start is None else np.searchsorted(self.time, start, side="left")
+        hi = len(self) if stop is None else np.searchsorted(self.time, stop, "right")
+        return self._new(self.time[lo:hi], self.values[lo:hi])
+
+    def align(self, arr: xr.DataArray, dim: str = "time") -> Self:
+        """Return the events whose times are on the `dim` coordinate of `arr`."""
+        keep = arr.get_index(dim).get_indexer(self.time) >= 0
+        return self._new(self.time[keep], self.values[keep])
+
+    def windows(
+        self, arr: xr.DataArray, pre: int = 0, post: int = 0, dim: str = "time"
+    ) -> xr.DataArray:
+        """Return a window of `arr` around each event.
+
+        See `event_windows` for the parameters. The magnitude of each event is added as
+        the ``magnitude`` coordinate along the ``event`` dimension.
+        """
+        out = event_windows(arr, self.time, pre, post, dim)
+        kept = np.searchsorted(self.time, out.event.data)
+        return out.assign_coords(magnitude=("event", self.values[kept]))
+
+    def to_dataarray(self, time: npt.ArrayLike | None = None) -> xr.DataArray:
+        """Return the events as a DataArray.
+
+        Parameters
+        ----------
+        time : npt.ArrayLike | None
+            If given, return a dense series on this time axis that is zero except at
+            the events. Events that are not on the time axis are dropped. By default,
+            only the events are included.
+
+        Returns
+        -------
+        xr.DataArray
+            The events along the ``time`` dimension.
+        """
+        if time is None:
+            return xr.DataArray(
+                self.values, dims=["time"], coords={"time": self.time}, name=self.name
+            )
+        out = xr.DataArray(
+            np.zeros(len(time), dtype=self.values.dtype),
+            dims=["time"],
+            coords={"time": time},
+            name=self.name,
+        )
+        idx = out.get_index("time").get_indexer(self.time)
+        out.data[idx[idx >= 0]] = self.values[idx >= 0]
+        return out
+
+
+def _exp_model(t: np.ndarray, amplitude: float, tau: float) -> np.ndarray:
+    return amplitude * np.exp(-t / tau)
+
+
+def fit_exp_decay(
+    arr: xr.DataArray,
+    dim: str = "time",
+    from_peak: bool = True,
+    window: float | None = None,
+    refine: bool = False,
+) -> xr.Dataset:
+    r"""Fit an exponential decay along one dimension of all series at once.
+
+    The model is :math:`y = A\exp(-(t - t_0)/\tau)`. A log-linear least squares fit
+    is done for all series in one matrix product of the fit masks with the powers of
+    the time axis, so series may have different start times and missing values.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        The series, for example with the dimensions (member, time). Only positive
+        values are used.
+    dim : str
+        The time dimension. A cftime axis is converted to years with `dt2float`.
+    from_peak : bool
+        Start the fit of each series at its maximum. Otherwise the fit starts at the
+        first time step.
+    window : float | None
+        Only use the time steps up to this long after the start. Default is to use
+        the rest of the series.
+    refine : bool
+        Refine each fit by non-linear least squares on the original values, starting
+        from the log-linear estimate. This loops over the series.
+
+    Returns
+    -------
+    xr.Dataset
+        The e-folding time `tau` (in units of `dim`), the amplitude `amplitude` at
+        the start time and the start time `t0`, over all dimensions but `dim`.
+
+    Examples
+    --------
+    >>> members = xr.concat(tmso2_global_means, dim="member", join="outer")
+    >>> fit_exp_decay(members, window=2).tau
+    """
+    arr = arr.transpose(..., dim)
+    t = np.asarray(arr[dim].data)
+    if not np.issubdtype(t.dtype, np.number):
+        t = np.asarray(dt2float(t))
+    y = np.asarray(arr).reshape(-1, len(t))
+    valid = np.isfinite(y) & (y > 0)
+    if from_peak:
+        peak = np.nanargmax(np.where(valid, y, -np.inf), axis=1)
+        t0 = t[peak]
+    else:
+        t0 = np.array([t[v][0] if v.any() else np.nan for v in valid])
+    valid &= t[None, :] >= t0[:, None]
+    if window is not None:
+        valid &= t[None, :] <= t0[:, None] + window
+    w = valid.astype(float)
+    log_y = np.log(np.where(valid, y, 1))
+    # Moments of the time axis and of log(y) for every series, in two products.
+    moments = w @ np.stack([np.ones_like(t), t, t**2], axis=1)
+    rhs = (w * log_y) @ np.stack([np.ones_like(t), t], axis=1)
+    det = moments[:, 0] * moments[:, 2] - moments[:, 1] ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (moments[:, 0] * rhs[:, 1] - moments[:, 1] * rhs[:, 0]) / det
+        intercept = (rhs[:, 0] - slope * moments[:, 1]) / moments[:, 0]
+        tau = -1 / slope
+    amplitude = np.exp(intercept + slope * t0)
+    if refine:
+        for i in np.flatnonzero(np.isfinite(tau) & (tau > 0)):
+            try:
+                (amplitude[i], tau[i]), _ = scipy.optimize.curve_fit(
+                    _exp_model,
+                    t[valid[i]] - t0[i],
+                    y[i, valid[i]],
+                    p0=(amplitude[i], tau[i]),
+                )
+            except RuntimeError:
+                continue
+    template = arr.isel({dim: 0}, drop=True)
+    out = {
+        name: template.copy(data=values.reshape(template.shape))
+        for name, values in (("tau", tau), ("amplitude", amplitude), ("t0", t0))
+    }
+    return xr.Dataset(out, attrs=arr.attrs)
+
+
 def find_peak(arr: xr.DataArray | npt.NDArray, version: str) -> float:
     """Find the peak of an array."""
     match version:
@@ -0,0 +1,543 @@
+"""Work with the vertical coordinate of CESM2 output fields."""
+
+import pathlib
+from collections.abc import Iterable
+from typing import Self
+
+import numpy as np
+import xarray as xr
+from volcano_base.load import FindFiles
+
+import paper1_code as core
+
+# fmt: off
+ILEV = [
+    4.50049997269275e-06, 7.42010008991656e-06, 1.22337002750328e-05, 2.01700007806949e-05,
+    3.32545013748131e-05, 5.48274989853326e-05, 9.03979966437873e-05, 0.000149040005226198,
+    0.000245720002567396, 0.000405125007318929, 0.000667940014409396, 0.00110126495656004,
+    0.00181564996637462, 0.00299349994747899, 0.00496299981023185, 0.00815065141068771,
+    0.0134769998112461, 0.0223189999815077, 0.0367965003533754, 0.060664999182336,
+    0.0991565029835328, 0.157389993546531, 0.238849999732338, 0.34520000917837,
+    0.475134991575032, 0.631804985459894, 0.829154974780977, 1.08274002559483,
+    1.40684994403273, 1.81885005440563, 2.33979988843203, 2.99505004659295,
+    3.81470005959272, 4.83444985002279, 6.09635002911091, 7.64934998005629,
+    9.55010019242764, 11.8640000000596, 14.6655002608895, 18.0380009114742,
+    22.0755003392696, 26.8824994564056, 32.5734987854958, 39.2730012536049,
+    47.1144989132881, 56.2404990196228, 66.8004974722862, 80.7014182209969,
+    94.9410423636436, 111.69321089983, 131.401270627975, 154.586806893349,
+    181.863352656364, 213.952820748091, 251.704417169094, 296.117216348648,
+    348.366588354111, 409.83521938324, 482.149928808212, 567.22442060709,
+    652.332969009876, 730.445891618729, 796.363070607185, 845.353666692972,
+    873.715866357088, 900.324631482363, 924.964462406933, 947.432334534824,
+    967.538624536246, 985.112190246582, 1000,
+]
+LEV = [
+    5.96030003130466e-06, 9.82690018247467e-06, 1.62018505278638e-05, 2.6712251077754e-05,
+    4.40410001800728e-05, 7.261274781456e-05, 0.000119719000934992, 0.000197380003896797,
+    0.000325422504943162, 0.000536532510864163, 0.00088460248548472, 0.00145845746146733,
+    0.00240457495692681, 0.00397824987885542, 0.00655682561045978, 0.0108138256109669,
+    0.0178979998963769, 0.0295577501674416, 0.0487307497678557, 0.0799107510829344,
+    0.128273248265032, 0.198119996639434, 0.292025004455354, 0.410167500376701,
+    0.553469988517463, 0.730479980120435, 0.955947500187904, 1.24479498481378,
+    1.61284999921918, 2.07932497141883, 2.66742496751249, 3.40487505309284,
+    4.32457495480776, 5.46539993956685, 6.8728500045836, 8.59972508624196,
+    10.7070500962436, 13.2647501304746, 16.3517505861819, 20.0567506253719,
+    24.4789998978376, 29.7279991209507, 35.9232500195503, 43.1937500834465,
+    51.6774989664555, 61.5204982459545, 73.7509578466415, 87.8212302923203,
+    103.317126631737, 121.547240763903, 142.994038760662, 168.225079774857,
+    197.908086702228, 232.828618958592, 273.910816758871, 322.241902351379,
+    379.100903868675, 445.992574095726, 524.687174707651, 609.778694808483,
+    691.389430314302, 763.404481112957, 820.858368650079, 859.53476652503,
+    887.020248919725, 912.644546944648, 936.198398470879, 957.485479535535,
+    976.325407391414, 992.556095123291,
+]
+# fmt: on
+# Both ILEV and LEV go top-down, so level k lies between ILEV[k] and ILEV[k + 1].
+LOG_P_RATIO = np.log(np.asarray(ILEV[1:]) / np.asarray(ILEV[:-1]))
+# The log-pressure distance from the lower interface up to the mid-point of each level.
+LOG_P_MID = np.log(np.asarray(ILEV[1:]) / np.asarray(LEV))
+DRY_AIR_GAS_CONST = 287  # J kg^-1 K^-1
+GRAVITY = 9.81  # m s^-2
+EARTH_RADIUS = 6.371e6  # m
+
+
+def stratosphere_mask(
+    lev: xr.DataArray, trop_p: xr.DataArray, lev_units: float = 100
+) -> xr.DataArray:
+    """Return a mask that is True for levels above the tropopause.
+
+    Parameters
+    ----------
+    lev : xr.DataArray
+        The pressure of the model levels, in hPa by default.
+    trop_p : xr.DataArray
+        The tropopause pressure in Pa (`TROP_P`), typically with dimensions time, lat
+        and lon.
+    lev_units : float
+        Factor that converts `lev` to Pa.
+
+    Returns
+    -------
+    xr.DataArray
+        A boolean mask with the dimensions of `lev` and `trop_p` combined.
+    """
+    return lev * lev_units < trop_p
+
+
+def stratosphere(
+    arr: xr.DataArray,
+    trop_p: xr.DataArray,
+    lev: str = "lev",
+    max_trop_p: float | None = None,
+) -> xr.DataArray:
+    """Keep only the stratospheric part of a field, setting the rest to NaN.
+
+    Levels that are below the tropopause everywhere are dropped before the mask is
+    applied. The slice is lazy, so for fields that are opened lazily (as done by
+    `volcano_base.load.FindFiles`) those levels are never read from disk.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        A field on the hybrid levels, with `lev` in hPa.
+    trop_p : xr.DataArray
+        The tropopause pressure in Pa (`TROP_P`) of the same simulation.
+    lev : str
+        The name of the vertical dimension.
+    max_trop_p : float | None
+        The largest tropopause pressure in Pa. Levels with a higher pressure are
+        dropped. Default is to find it from `trop_p`, which reads the time steps of
+        `trop_p` that are also in `arr` once.
+
+    Returns
+    -------
+    xr.DataArray
+        The field restricted to levels that are stratospheric somewhere, with NaN in
+        all tropospheric grid cells.
+
+    Examples
+    --------
+    Reductions skip NaN, so the global stratospheric mean of a field is
+
+    >>> strat = stratosphere(oh, trop_p)
+    >>> core.utils.time_series.mean_flatten(strat, dims=["lat", "lon"])
+    """
+    trop_p, arr_ = xr.align(trop_p, arr, join="inner", exclude=[lev])
+    if max_trop_p is None:
+        max_trop_p = float(trop_p.max())
+    keep = np.flatnonzero(arr_[lev].data * 100 < max_trop_p)
+    arr_ = arr_.isel({lev: keep})
+    mask = stratosphere_mask(arr_[lev], trop_p)
+    return arr_.where(mask).assign_attrs(arr.attrs)
+
+
+def _level_table(table: np.ndarray, arr: xr.DataArray, lev: str) -> xr.DataArray:
+    """Return a per-level table as a data array matching the levels of `arr`."""
+    out = xr.DataArray(table, dims=lev)
+    if arr.sizes[lev] == len(LEV):
+        return out
+    # Only a subset of the levels is used, so pick the matching entries.
+    out = out.assign_coords({lev: LEV}).sel({lev: arr[lev].data}, method="nearest")
+    return out.assign_coords({lev: arr[lev]})
+
+
+def layer_thickness(temp: xr.DataArray, lev: str = "lev") -> xr.DataArray:
+    r"""Calculate the geometric thickness of each model layer.
+
+    Parameters
+    ----------
+    temp : xr.DataArray
+        The temperature in kelvin (`T`) on all or a subset of the levels in `LEV`.
+    lev : str
+        The name of the vertical dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        The layer thickness in meters, lazy if `temp` is lazy.
+
+    Notes
+    -----
+    The hypsometric equation for a layer between the interfaces :math:`P_1<P_2`,
+
+    .. math::
+
+        h = \frac{RT}{g}\ln{\frac{P_2}{P_1}},
+
+    is found for all levels in one broadcast against the precomputed `LOG_P_RATIO`.
+    """
+    log_p = _level_table(LOG_P_RATIO, temp, lev)
+    return DRY_AIR_GAS_CONST / GRAVITY * temp * log_p
+
+
+def altitude(temp: xr.DataArray, lev: str = "lev") -> xr.DataArray:
+    """Convert the hybrid pressure levels to geometric altitude.
+
+    The layer thicknesses from `layer_thickness` are accumulated from the bottom
+    interface at 1000 hPa, which is taken as zero altitude, and the distance from the
+    lower interface to the mid-point of each level is added on top.
+
+    Parameters
+    ----------
+    temp : xr.DataArray
+        The temperature in kelvin (`T`) on all levels in `LEV`, with any other
+        dimensions such as time, lat and lon.
+    lev : str
+        The name of the vertical dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        The altitude in meters of the mid-point of each level, with the same shape as
+        `temp`. It is lazy if `temp` is lazy.
+
+    See Also
+    --------
+    volcano_base.manipulate.pressureheight2metricheight :
+        A conversion that does not depend on temperature.
+    """
+    thickness = layer_thickness(temp, lev)
+    # Levels go top-down, so the sum over all layers below is a reversed cumsum.
+    below = thickness.isel({lev: slice(None, None, -1)}).cumsum(lev)
+    below = below.isel({lev: slice(None, None, -1)}) - thickness
+    mid = DRY_AIR_GAS_CONST / GRAVITY * temp * _level_table(LOG_P_MID, temp, lev)
+    return (below + mid).rename("altitude").assign_attrs(units="m")
+
+
+def _interpolate_columns(
+    values: np.ndarray, z: np.ndarray, heights: np.ndarray
+) -> np.ndarray:
+    """Linearly interpolate columns of `values` at altitudes `z` to `heights`.
+
+    The last axis of `values` and `z` is the vertical, with `z` decreasing along it.
+    All columns are handled in one call to `np.searchsorted` by offsetting each
+    column so that the flattened altitudes are sorted.
+    """
+    shape = values.shape[:-1]
+    n_lev = values.shape[-1]
+    z_ = -z.reshape(-1, n_lev)
+    v_ = values.reshape(-1, n_lev)
+    low = min(np.nanmin(z_), -heights.max())
+    width = max(np.nanmax(z_), -heights.min()) - low + 1
+    offset = width * np.arange(len(z_))[:, None]
+    targets = -heights[None, :] - low + offset
+    idx = np.searchsorted((z_ - low + offset).ravel(), targets.ravel(), side="right")
+    # Number of levels in each column that are at or above each height.
+    idx = idx.reshape(targets.shape) - n_lev * np.arange(len(z_))[:, None]
+    below = np.clip(idx, 1, n_lev - 1)
+    above = below - 1
+    z_below = np.take_along_axis(z_, below, axis=1)
+    z_above = np.take_along_axis(z_, above, axis=1)
+    v_below = np.take_along_axis(v_, below, axis=1)
+    v_above = np.take_along_axis(v_, above, axis=1)
+    weight = (targets - offset + low - z_below) / (z_above - z_below)
+    out = v_below + weight * (v_above - v_below)
+    out[(idx == 0) | (idx == n_lev)] = np.nan
+    return out.reshape(*shape, len(heights))
+
+
+def interpolate_to_altitude(
+    arr: xr.DataArray,
+    z: xr.DataArray,
+    heights: np.ndarray | list[float],
+    time_chunk: int = 12,
+    lev: str = "lev",
+) -> xr.DataArray:
+    """Interpolate a field on model levels to a fixed altitude grid.
+
+    The interpolation is done chunk by chunk along time, with all columns of a chunk
+    handled by NumPy broadcasting.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        The field on model levels.
+    z : xr.DataArray
+        The altitude of the model levels in meters, such as from `altitude`, with the
+        same dimensions as `arr`.
+    heights : np.ndarray | list[float]
+        The altitudes in meters to interpolate to. Values outside of the model levels
+        of a column are NaN.
+    time_chunk : int
+        Number of time steps that are interpolated at a time.
+    lev : str
+        The name of the vertical dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        The (lazy) field with `lev` replaced by an `altitude` dimension last.
+
+    Examples
+    --------
+    >>> z = altitude(temp)
+    >>> so4_km = interpolate_to_altitude(so4, z, np.arange(0, 40_001, 500))
+    """
+    heights = np.asarray(heights, dtype=float)
+    chunks = {"time": time_chunk, lev: -1} if "time" in arr.dims else {lev: -1}
+    arr, z = xr.align(arr.chunk(chunks), z.chunk(chunks), join="exact")
+    out = xr.apply_ufunc(
+        _interpolate_columns,
+        arr,
+        z,
+        kwargs={"heights": heights},
+        input_core_dims=[[lev], [lev]],
+        output_core_dims=[["altitude"]],
+        dask="parallelized",
+        output_dtypes=[np.float64],
+        dask_gufunc_kwargs={"output_sizes": {"altitude": len(heights)}},
+    )
+    return out.assign_coords(altitude=("altitude", heights, {"units": "m"}))
+
+
+def cell_area(lat: xr.DataArray, n_lon: int) -> xr.DataArray:
+    """Return the area in m2 of a grid cell at each latitude of a regular grid."""
+    weights = np.cos(np.deg2rad(lat))
+    return 4 * np.pi * EARTH_RADIUS**2 * weights / (weights.sum() * n_lon)
+
+
+def pressure_thickness(hybrid: xr.Dataset, ps: xr.DataArray) -> xr.DataArray:
+    r"""Calculate the pressure thickness of each hybrid level.
+
+    The pressure of interface :math:`k` is :math:`A_k P_0 + B_k p_s`, so level
+    :math:`k` is :math:`\Delta A_k P_0 + \Delta B_k p_s` thick.
+
+    Parameters
+    ----------
+    hybrid : xr.Dataset
+        The hybrid coefficients `hyai` and `hybi` on the interfaces, the reference
+        pressure `P0` in Pa and the levels `lev`, as found in every CESM output file.
+    ps : xr.DataArray
+        The surface pressure in Pa (`PS`).
+
+    Returns
+    -------
+    xr.DataArray
+        The pressure thickness in Pa, with the dimensions of `ps` and ``lev``.
+    """
+    coords = {"lev": hybrid.lev.data}
+    da = xr.DataArray(np.diff(hybrid.hyai.data), dims="lev", coords=coords)
+    db = xr.DataArray(np.diff(hybrid.hybi.data), dims="lev", coords=coords)
+    return da * float(hybrid.P0) + db * ps
+
+
+def global_burden(
+    arr: xr.DataArray,
+    dp: xr.DataArray,
+    lev: str = "lev",
+    lat: str = "lat",
+    lon: str = "lon",
+) -> xr.DataArray:
+    """Integrate a mass mixing ratio over levels and area to a global burden.
+
+    The mixing ratio, the pressure thickness of each level and the cell areas are
+    contracted in a single reduction, so a lazy field is read once, one chunk at a
+    time. Missing values, such as the tropospheric cells masked by `stratosphere`,
+    count as zero.
+
+    Parameters
+    ----------
+    arr : xr.DataArray
+        The mass mixing ratio in kg/kg, on all or a subset of the levels in `LEV`.
+    dp : xr.DataArray
+        The pressure thickness in Pa of all levels in the same simulation, from
+        `pressure_thickness`.
+    lev : str
+        The name of the vertical dimension.
+    lat : str
+        The name of the latitude dimension.
+    lon : str
+        The name of the longitude dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        The burden in Tg.
+    """
+    dp = dp.sel({lev: arr[lev].data})
+    area = cell_area(arr[lat], arr.sizes[lon])
+    kg = xr.dot(arr.fillna(0), dp * area, dim=[lev, lat, lon]) / GRAVITY
+    return kg * 1e-9
+
+
+class VerticalProfile:
+    """Area weighted mean vertical profile of the sum of one or more fields.
+
+    The files are found through the archive index of `volcano_base.load.FindFiles`
+    and opened lazily. The time window is selected before anything is read, the fields
+    are summed and averaged in one chunked pass, and only the small result is kept.
+
+    Parameters
+    ----------
+    finder : FindFiles
+        The files of one simulation, one file per variable that should be summed.
+    time : slice | None
+        The time window to keep. Default is the full simulation.
+    dims : Iterable[str] | None
+        The dimensions to average over. Default is ["lat", "lon"], giving a (time, lev)
+        profile, while ["lon"] gives the zonal mean.
+    stratosphere : bool
+        Mask out the troposphere using the `TROP_P` output of the same simulation.
+
+    Examples
+    --------
+    The mode-summed sulfate profile of the first three years of the strong eruption:
+
+    >>> profile = VerticalProfile.so4("strong", "ens1", slice("1850", "1852"))
+    >>> profile.load("so4-strong-ens1").plot(x="time")
+    """
+
+    SO4 = ("so4_a1", "so4_a2", "so4_a3")
+
+    def __init__(
+        self,
+        finder: FindFiles,
+        time: slice | None = None,
+        dims: Iterable[str] | None = None,
+        stratosphere: bool = False,
+    ) -> None:
+        self.finder = finder
+        self.time = slice(None) if time is None else time
+        self.dims = ["lat", "lon"] if dims is None else list(dims)
+        self.stratosphere = stratosphere
+
+    @classmethod
+    def so4(
+        cls,
+        sim: str,
+        ensemble: str,
+        time: slice | None = None,
+        index: FindFiles | None = None,
+        **kwargs,
+    ) -> Self:
+        """Create the profile of the sulfate concentration summed over all modes.
+
+        The files are searched for in `index`, which can be any `FindFiles` object. It
+        is copied and not changed, so one index can be shared between all members
+        instead of scanning the archive for each of them. Default is a new index.
+        """
+        index = FindFiles() if index is None else index
+        finder = (
+            index.copy()
+            .find(set(cls.SO4), "e_fSST1850", sim, ensemble, "h0")
+            .keep_most_recent()
+            .sort("attr")
+        )
+        return cls(finder, time, **kwargs)
+
+    def _same_simulation(self, arr: xr.DataArray, attr: str) -> FindFiles:
+        """Find another output field of the simulation that `arr` is from.
+
+        The search reuses the index of `self.finder`, so the archive is not scanned
+        again.
+        """
+        keys = [arr.attrs[k] for k in ("compset", "sim", "ensemble", "freq")]
+        return self.finder.copy().find(attr, *keys).keep_most_recent()
+
+    def compute(self, time_chunk: int = 12) -> xr.DataArray:
+        """Compute the profile.
+
+        Parameters
+        ----------
+        time_chunk : int
+            Number of time steps of the 4D fields that are read and reduced at a time.
+
+        Returns
+        -------
+        xr.DataArray
+            The mean profile in memory, with the attributes of the first field.
+        """
+        arrs = [arr.sel(time=self.time) for arr in self.finder.load()]
+        total = sum(arrs[1:], start=arrs[0]).chunk({"time": time_chunk})
+        if self.stratosphere:
+            trop_p = self._same_simulation(arrs[0], "TROP_P").load()[0]
+            total = stratosphere(total, trop_p.sel(time=self.time))
+        out = core.utils.time_series.mean_flatten(total, dims=self.dims[:])
+        name = "+".join(str(arr.name) for arr in arrs)
+        return out.compute().rename(name).assign_attrs(arrs[0].attrs)
+
+    def _cache_attrs(self) -> dict[str, str]:
+        """Return the parameters the cached result depends on."""
+        return {
+            "profile_class": type(self).__name__,
+            "profile_time": f"{self.time.start}:{self.time.stop}",
+            "profile_dims": ",".join(self.dims),
+            "profile_stratosphere": str(self.stratosphere),
+        }
+
+    def load(self, name: str, time_chunk: int = 12) -> xr.DataArray:
+        """Get the profile from the cache, or compute and cache it.
+
+        The time window, dimensions and stratosphere mask are saved with the cached
+        file, and the profile is computed again if they do not match.
+
+        Parameters
+        ----------
+        name : str
+            Name of the cached file in the output directory, without suffix.
+        time_chunk : int
+            Passed on to `compute` if the profile is not cached.
+
+        Returns
+        -------
+        xr.DataArray
+            The mean profile.
+        """
+        file: pathlib.Path = core.utils.if_save.create_savedir() / f"{name}.nc"
+        key = self._cache_attrs()
+        if file.exists():
+            cached = xr.load_dataarray(file)
+            if all(cached.attrs.get(k) == v for k, v in key.items()):
+                return cached
+        out = self.compute(time_chunk).assign_attrs(key)
+        out.to_netcdf(file)
+        return out
+
+
+class ColumnBurden(VerticalProfile):
+    """Global burden of the sum of one or more mass mixing ratio fields.
+
+    The fields are found, subset in time and cached in the same way as for
+    `VerticalProfile`, but are integrated with `global_burden` using the `PS` output
+    of the same simulation and the hybrid coefficients in its file. The `dims`
+    parameter is not used.
+
+    Examples
+    --------
+    The burden of sulfate aerosol summed over all modes, which can be compared with
+    the `TMSO2` burden:
+
+    >>> burden = ColumnBurden.so4("strong", "ens1").load("so4-burden-strong-ens1")
+    """
+
+    def _cache_attrs(self) -> dict[str, str]:
+        """Return the parameters the cached result depends on."""
+        return {**super()._cache_attrs(), "burden_dp": "hyai,hybi"}
+
+    def compute(self, time_chunk: int = 12) -> xr.DataArray:
+        """Compute the burden.
+
+        Parameters
+        ----------
+        time_chunk : int
+            Number of time steps of the 4D fields that are read and reduced at a time.
+
+        Returns
+        -------
+        xr.DataArray
+            The burden in Tg, in memory.
+        """
+        arrs = [arr.sel(time=self.time) for arr in self.finder.load()]
+        total = sum(arrs[1:], start=arrs[0]).chunk({"time": time_chunk})
+        if self.stratosphere:
+            trop_p = self._same_simulation(arrs[0], "TROP_P").load()[0]
+            total = stratosphere(total, trop_p.sel(time=self.time))
+        ps_file = self._same_simulation(arrs[0], "PS")
+        ps = ps_file.load()[0].sel(time=self.time).chunk({"time": time_chunk})
+        path = ps_file.regex.reverse_search(ps_file.get_files().unwrap()[0], ".nc")
+        with xr.open_dataset(path) as ds:
+            hybrid = ds[["hyai", "hybi", "P0", "lev"]].load()
+        out = global_burden(total, pressure_thickness(hybrid, ps))
+        name = "+".join(str(arr.name) for arr in arrs)
+        attrs = {**arrs[0].attrs, "long_name": f"{name} burden", "units": "Tg"}
+        return out.compute().rename(name).assign_attrs(attrs)
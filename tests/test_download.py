@@ -0,0 +1,99 @@
+"""Test the download manager against a local HTTP server."""
+
+import hashlib
+import http.server
+import pathlib
+import threading
+from collections.abc import Iterator
+
+import pytest
+
+import paper1_code as core
+
+FILES = {"/a.nc": bytes(range(256)) * 400, "/b.nc": b"volcano" * 1000}
+
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    ranges: list[str] = []
+
+    def do_GET(self) -> None:  # noqa: N802
+        data = FILES[self.path]
+        if header := self.headers.get("Range"):
+            self.ranges.append(header)
+            start = int(header.removeprefix("bytes=").split("-")[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            data = data[start:]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[str]:
+    """Serve `FILES` on localhost."""
+    _RangeHandler.ranges.clear()
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_download_resume(server: str, tmp_path: pathlib.Path) -> None:
+    """Test concurrent downloads, resuming a partial file and the manifest."""
+    manifest = tmp_path / "manifest.json"
+    entries = [
+        core.load.download.ManifestEntry(
+            f"{server}{name}", f"sub{name}", hashlib.sha256(data).hexdigest()
+        )
+        for name, data in FILES.items()
+    ]
+    core.load.download.write_manifest(manifest, entries)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.nc.part").write_bytes(FILES["/a.nc"][:1000])
+    manager = core.load.download.DownloadManager.from_manifest(manifest, tmp_path)
+    assert len(manager.missing()) == len(FILES)
+    paths = manager.download(progress=False)
+    for path, data in zip(paths, FILES.values(), strict=True):
+        assert path.read_bytes() == data
+    assert _RangeHandler.ranges == ["bytes=1000-"]
+    assert not manager.missing()
+
+
+def test_download_checksum(server: str, tmp_path: pathlib.Path) -> None:
+    """Test that a file with the wrong checksum is rejected and removed."""
+    manager = core.load.download.DownloadManager(tmp_path).add(
+        f"{server}/b.nc", "b.nc", sha256="0" * 64
+    )
+    with pytest.raises(ValueError, match="checksum"):
+        manager.download(progress=False)
+    assert not list(tmp_path.iterdir())
+
+
+def test_update_manifest(server: str, tmp_path: pathlib.Path) -> None:
+    """Test that the checksum of a downloaded file is recorded and then verified."""
+    manifest = tmp_path / "manifest.json"
+    data = tmp_path / "data"
+    core.load.download.DownloadManager(data).add(f"{server}/a.nc", "a.nc").download(
+        progress=False
+    )
+    core.load.download.DownloadManager(data).add(
+        f"{server}/a.nc", "a.nc"
+    ).update_manifest(manifest)
+    (entry,) = core.load.download.read_manifest(manifest)
+    assert entry.sha256 == hashlib.sha256(FILES["/a.nc"]).hexdigest()
+    manager = core.load.download.DownloadManager.from_manifest(
+        manifest, data, max_workers=1
+    )
+    assert manager.max_workers == 1
+    (data / "a.nc").write_bytes(b"changed")
+    assert manager.missing() == [entry]
@@ -0,0 +1,88 @@
+"""Test the Gregory et al. (2016) loader."""
+
+import os
+import pathlib
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import paper1_code as core
+
+
+def _write(path: pathlib.Path, name: str, var: str) -> None:
+    xr.Dataset(
+        {var: ("time", np.arange(24.0), {"units": "K"})},
+        coords={"time": np.arange(24)},
+        attrs={"units": "ds"},
+    ).to_netcdf(path / name, engine="scipy")
+
+
+def test_dataset_pool(tmp_path: pathlib.Path) -> None:
+    """Test that datasets are reused, evicted when full and reopened when changed."""
+    pool = core.load.g16.DatasetPool(maxsize=2)
+    for name in ("a.nc", "b.nc", "c.nc"):
+        _write(tmp_path, name, "data")
+    a = pool.get(tmp_path / "a.nc")
+    assert pool.get(tmp_path / "a.nc") is a
+    pool.get(tmp_path / "b.nc")
+    pool.get(tmp_path / "c.nc")
+    assert len(pool) == pool.maxsize
+    a_reopened = pool.get(tmp_path / "a.nc")
+    assert a_reopened is not a
+    os.utime(tmp_path / "a.nc", (0, 0))
+    assert pool.get(tmp_path / "a.nc") is not a_reopened
+    pool.evict()
+    assert not len(pool)
+    with pytest.raises(OSError, match="No such file"):
+        pool.get(tmp_path / "d.nc")
+
+
+def test_dataset_pool_dropped(tmp_path: pathlib.Path) -> None:
+    """Test that datasets dropped from the pool are not closed, and can be used."""
+    pool = core.load.g16.DatasetPool(maxsize=1)
+    for name in ("a.nc", "b.nc"):
+        _write(tmp_path, name, "data")
+    closed = []
+    a = pool.get(tmp_path / "a.nc")
+    a.set_close(lambda: closed.append("a"))
+    b = pool.get(tmp_path / "b.nc")
+    b.set_close(lambda: closed.append("b"))
+    os.utime(tmp_path / "b.nc", (0, 0))
+    assert pool.get(tmp_path / "b.nc") is not b
+    assert not closed
+    np.testing.assert_array_equal(a["data"].values, np.arange(24.0))
+    np.testing.assert_array_equal(b["data"].values, np.arange(24.0))
+    pool.get(tmp_path / "a.nc").set_close(lambda: closed.append("a"))
+    pool.evict()
+    assert closed == ["a"]
+
+
+def test_gregory_paper_reload(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that loading twice from the pool gives the same attributes."""
+    (tmp_path / "gregory").mkdir()
+    _write(tmp_path / "gregory", "aod.nc", "data")
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    first = core.load.g16.gregory_paper().with_vars("aod").load()
+    second = core.load.g16.gregory_paper().with_vars("aod").load()
+    assert first[0].attrs == second[0].attrs
+    assert first[0].attrs["ds_units"] == "ds"
+    assert first[0].attrs["var_name"] == "aod"
+    core.load.g16.POOL.evict()
+
+
+def test_load_ensemble(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the members found on disk are stacked along an ensemble dimension."""
+    (tmp_path / "gregory").mkdir()
+    for e in (1, 3):
+        _write(tmp_path / "gregory", f"xjwgh{e}.tas.nc", "air_temperature")
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    ds = core.load.g16.gregory_paper().with_ensemble(1, 2, 3).load_ensemble()
+    np.testing.assert_array_equal(ds.ensemble, [1, 3])
+    assert ds.air_temperature.dims == ("ensemble", "time")
+    assert ds.attrs["var_name"] == "tas"
+    with pytest.raises(AttributeError, match="ensemble members"):
+        core.load.g16.gregory_paper().with_ensemble(2).load_ensemble()
+    core.load.g16.POOL.evict()
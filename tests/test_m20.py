@@ -0,0 +1,79 @@
+"""Test the Marshall et al. (2020) loader."""
+
+import pathlib
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import paper1_code as core
+
+
+def _write_eruptions(path: pathlib.Path) -> None:
+    """Write one January and two July eruptions on a 360 day calendar."""
+    path.mkdir(parents=True)
+    for name, season, so2, lat in (
+        ("UM_UKCA_a", "Jul", 20.0, 30.0),
+        ("UM_UKCA_b", "Jan", 5.0, 0.0),
+        ("UM_UKCA_c", "Jul", 10.0, -5.0),
+    ):
+        start = "1850-07-01" if season == "Jul" else "1850-01-01"
+        time = xr.cftime_range(start, periods=36, freq="MS", calendar="360_day")
+        data = {var: ("time", np.full(36, so2)) for var in core.load.m20.VARS}
+        attrs = {
+            "Eruption season": season,
+            "SO2 emission (Tg)": so2,
+            "Eruption latitude (degrees N)": lat,
+        }
+        xr.Dataset(
+            {**data, "unused": ("time", np.zeros(36))},
+            coords={"time": time},
+            attrs=attrs,
+        ).to_netcdf(path / f"{name}.nc", engine="scipy")
+
+
+def test_load_ensemble(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the eruptions are stacked, sorted and start on the same day."""
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    monkeypatch.setattr(core.config, "DATA_DIR_OUT", tmp_path / "out")
+    _write_eruptions(core.load.m20._data_path())
+    ds = core.load.m20.load_ensemble(cache=False)
+    assert set(ds.data_vars) == set(core.load.m20.VARS)
+    np.testing.assert_array_equal(ds.eruption, ["UM_UKCA_b", "UM_UKCA_c", "UM_UKCA_a"])
+    np.testing.assert_array_equal(ds.so2_emission_tg, [5.0, 10.0, 20.0])
+    np.testing.assert_array_equal(ds.effective_radiative_forcing[:, 0], [5, 10, 20])
+    assert ds.so2_emission_tg.attrs["long_name"] == "SO2 emission (Tg)"
+    assert str(ds.time.data[0]) == "1850-01-01 00:00:00"
+
+
+def test_load_ensemble_cache(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the cache is reused, and rebuilt when the files change."""
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    monkeypatch.setattr(core.config, "DATA_DIR_OUT", tmp_path / "out")
+    path = core.load.m20._data_path()
+    _write_eruptions(path)
+    first = core.load.m20.load_ensemble()
+    assert (tmp_path / "out" / "m20-ensemble.nc").exists()
+    xr.testing.assert_identical(core.load.m20.load_ensemble(), first)
+    (path / "UM_UKCA_a.nc").unlink()
+    ds = core.load.m20.load_ensemble()
+    np.testing.assert_array_equal(ds.eruption, ["UM_UKCA_b", "UM_UKCA_c"])
+
+
+def test_load_ensemble_read_only(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the ensemble is still returned if the cache cannot be written."""
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    monkeypatch.setattr(core.config, "DATA_DIR_OUT", tmp_path / "out")
+    _write_eruptions(core.load.m20._data_path())
+
+    def _fail(*args, **kwargs) -> None:
+        raise PermissionError("Read-only file system")
+
+    monkeypatch.setattr(xr.Dataset, "to_netcdf", _fail)
+    ds = core.load.m20.load_ensemble()
+    np.testing.assert_array_equal(ds.so2_emission_tg, [5.0, 10.0, 20.0])
+    assert not (tmp_path / "out" / "m20-ensemble.nc").exists()
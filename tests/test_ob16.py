@@ -0,0 +1,95 @@
+"""Test the storage of the CESM-LME series."""
+
+import pathlib
+
+import numpy as np
+import xarray as xr
+
+import paper1_code as core
+
+
+def test_daily_series(tmp_path: pathlib.Path) -> None:
+    """Test that a series converted from .npz gives the same values and time axis."""
+    time = xr.cftime_range("0850-01-01", periods=365 * 3, freq="D", calendar="noleap")
+    data = np.random.default_rng(0).normal(size=len(time))
+    np.savez(tmp_path / "TREFHT-001.npz", data=data, times=time.values)
+    series = core.load.ob16._open_series(tmp_path, "TREFHT-001")
+    assert core.load.ob16.DailySeries.exists(tmp_path / "TREFHT-001")
+    assert isinstance(series.data, np.memmap)
+    full = series.isel()
+    np.testing.assert_array_equal(full, data)
+    np.testing.assert_array_equal(full.time, time.values)
+    window = series.sel("0851-01-01", "0851-12-31")
+    np.testing.assert_array_equal(window, data[365:730])
+    np.testing.assert_array_equal(window.time, time.values[365:730])
+
+
+def test_daily_series_axis(tmp_path: pathlib.Path) -> None:
+    """Test that converted series are put on the daily axis from 0850-01-01."""
+    time = xr.cftime_range("0850-01-01", periods=365 * 2, freq="D", calendar="noleap")
+    shifted = xr.cftime_range("0850-01-02", periods=len(time), calendar="noleap")
+    np.savez(tmp_path / "FSNTOA-001.npz", data=np.ones(len(time)), times=shifted.values)
+    series = core.load.ob16._open_series(tmp_path, "FSNTOA-001")
+    np.testing.assert_array_equal(series.isel().time, time.values)
+
+
+def test_median(tmp_path: pathlib.Path) -> None:
+    """Test that the median of the series matches `get_median` of the full arrays."""
+    rng = np.random.default_rng(0)
+    series = [
+        core.load.ob16.DailySeries.save(tmp_path / f"rf-{i}", rng.normal(size=730))
+        for i in range(3)
+    ]
+    expected = core.utils.time_series.get_median(
+        [s.isel() for s in series], xarray=True
+    )
+    xr.testing.assert_identical(core.load.ob16._median(series), expected)
+
+
+def _with_climatology(arr: xr.DataArray, control: xr.DataArray) -> xr.DataArray:
+    clim = control.groupby("time.dayofyear").mean()
+    return arr.groupby("time.dayofyear") - clim + core.config.MEANS["TREFHT"]
+
+
+def test_remove_seasonality(tmp_path: pathlib.Path, monkeypatch) -> None:
+    """Test the control climatology against a groupby, and that it is cached."""
+    path = tmp_path / "cesm-lme"
+    path.mkdir()
+    monkeypatch.setattr(core.config, "DATA_DIR_ROOT", tmp_path)
+    name = "TREFHT850forcing-control-003"
+    t = np.arange(365 * 4)
+    rng = np.random.default_rng(0)
+    data = 288 + 5 * np.sin(2 * np.pi * t / 365) + rng.normal(size=len(t))
+    control = core.load.ob16.DailySeries.save(path / name, data).isel()
+    arr = control + 1
+    out = core.load.ob16._remove_seasonality_ob16(arr)
+    np.testing.assert_allclose(out, _with_climatology(arr, control))
+    cache = path / f"{name}-climatology.npz"
+    mtime = cache.stat().st_mtime_ns
+    core.load.ob16._remove_seasonality_ob16(arr)
+    assert cache.stat().st_mtime_ns == mtime
+    # A regenerated control run gives a new climatology.
+    control = core.load.ob16.DailySeries.save(path / name, data[: 365 * 2] + 1).isel()
+    out = core.load.ob16._remove_seasonality_ob16(arr)
+    np.testing.assert_allclose(out, _with_climatology(arr[: 365 * 2], control))
+
+
+def test_script_urls(tmp_path: pathlib.Path, monkeypatch) -> None:
+    """Test that the output file URLs are read from the download scripts."""
+    monkeypatch.setattr(core.config, "PROJECT_ROOT", tmp_path)
+    load = tmp_path / "src" / "paper1_code" / "load"
+    load.mkdir(parents=True)
+    url = "https://example.org/daily/TREFHT/b.e11.TREFHT.08500101-18491231.nc"
+    script = f'files = [\n    "{url}",\n    "https://example.org/readme.txt",\n]\n'
+    (load / core.load.ob16.DOWNLOAD_SCRIPTS["TREFHT"]).write_text(script)
+    urls = core.load.ob16._script_urls("TREFHT")
+    assert urls == {"b.e11.TREFHT.08500101-18491231.nc": url}
+
+
+def test_gao_spikes() -> None:
+    """Test that only the top of each spike is kept, placed on the first day."""
+    frc = np.array([0, 1e-5, 3e-5, 2e-5, 1e-6, 4e-5, 4e-5, 0])
+    spikes = core.load.ob16._gao_spikes(frc)
+    np.testing.assert_array_equal(np.flatnonzero(spikes), [2, 5])
+    days = core.load.ob16._month_first_day(len(frc), start=12)
+    np.testing.assert_array_equal(days[:3], [0, 31, 62])
@@ -0,0 +1,33 @@
+"""Test the min/max pyramid."""
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+import paper1_code as core
+
+
+def test_pyramid_levels() -> None:
+    """Test that every level holds the min, max and mean of its bins."""
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=1000)
+    y[[3, 500]] = np.nan
+    pyramid = core.utils.pyramid.MinMaxPyramid(np.arange(1000), y, min_bins=10)
+    for k in range(len(pyramid)):
+        bins = [y[i : i + 2**k] for i in range(0, len(y), 2**k)]
+        np.testing.assert_array_equal(pyramid.levels[k]["min"], [*map(np.nanmin, bins)])
+        np.testing.assert_array_equal(pyramid.levels[k]["max"], [*map(np.nanmax, bins)])
+        np.testing.assert_allclose(pyramid.mean(k), [*map(np.nanmean, bins)])
+
+
+def test_pyramid_plot() -> None:
+    """Test that the number of points drawn follows the axes width, not the series."""
+    y = np.sin(np.arange(500_000) / 1000)
+    pyramid = core.utils.pyramid.MinMaxPyramid(np.arange(len(y)), y)
+    fig, ax = plt.subplots()
+    line = core.utils.pyramid.plot(ax, pyramid)
+    width = ax.bbox.width
+    assert len(line.get_xdata()) <= 4 * width + 4
+    assert max(line.get_ydata()) == y.max()
+    ax.set_xlim(1000, 1100)
+    np.testing.assert_array_equal(line.get_ydata(), y[999:1102])
+    plt.close(fig)
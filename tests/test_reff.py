@@ -0,0 +1,75 @@
+"""Test the effective radius module."""
+
+import pathlib
+
+import numpy as np
+import xarray as xr
+
+import paper1_code as core
+
+
+def _fields(n_time: int = 30) -> tuple[xr.DataArray, xr.DataArray, xr.DataArray]:
+    rng = np.random.default_rng(0)
+    lat = np.linspace(-90, 90, 8)
+    coords = {
+        "time": np.arange(float(n_time)),
+        "lev": np.asarray(core.utils.vertical.LEV),
+        "lat": lat,
+        "lon": np.arange(6.0),
+    }
+    dims = ["time", "lev", "lat", "lon"]
+    shape = (n_time, len(core.utils.vertical.LEV), len(lat), 6)
+    reff = xr.DataArray(rng.uniform(1e-5, 5e-5, shape), dims=dims, coords=coords)
+    temp = xr.DataArray(rng.uniform(200, 280, shape), dims=dims, coords=coords)
+    sad = xr.DataArray(rng.uniform(0, 1e-8, shape), dims=dims, coords=coords)
+    return reff, temp, sad
+
+
+def _layer_thickness(temp: np.ndarray, lev: np.ndarray) -> np.ndarray:
+    """Find the thickness level by level, between the interfaces around each `lev`."""
+    ilev = core.utils.vertical.ILEV
+    h = np.empty_like(temp)
+    for k, p in enumerate(lev):
+        p_top, p_bottom = ilev[k], ilev[k + 1]
+        assert p_top < p < p_bottom
+        h[:, k] = 287 * temp[:, k] / 9.81 * np.log(p_bottom / p_top)
+    return h
+
+
+def test_reff() -> None:
+    """Test the default effective radius of lat/lon averaged fields against NumPy."""
+    reff, temp, sad = _fields()
+    out = core.utils.reff.Reff(reff, temp, sad).calculate_reff()
+    w = np.cos(np.deg2rad(reff.lat.data))[None, None, :, None]
+    reff_, temp_, sad_ = (
+        (arr.data * w).sum(axis=(2, 3)) / (w.sum() * arr.sizes["lon"])
+        for arr in (reff, temp, sad)
+    )
+    coeff = sad_ * _layer_thickness(temp_, reff.lev.data)
+    expected = (coeff * reff_ * 10_000).sum(axis=1) / coeff.sum(axis=1)
+    np.testing.assert_allclose(out, expected)
+
+
+def test_reff_per_grid_cell() -> None:
+    """Test the streaming per grid cell effective radius against plain NumPy."""
+    reff, temp, sad = _fields()
+    out = core.utils.reff.Reff(reff, temp, sad, per_grid_cell=True, time_chunk=7)
+    h = _layer_thickness(temp.data, reff.lev.data)
+    w = np.cos(np.deg2rad(reff.lat.data))[None, None, :, None]
+    num = (sad.data * h * reff.data * 10_000 * w).sum(axis=(1, 2, 3))
+    den = (sad.data * h * w).sum(axis=(1, 2, 3))
+    np.testing.assert_allclose(out.calculate_reff().compute(), num / den)
+
+
+def test_reff_batch_paths(tmp_path: pathlib.Path) -> None:
+    """Test that files given by path give the same result as the arrays."""
+    reff, temp, sad = _fields(n_time=6)
+    file = tmp_path / "sim.nc"
+    xr.Dataset({"REFF_AERO": reff, "T": temp, "SAD_AERO": sad}).to_netcdf(
+        file, engine="scipy"
+    )
+    kwargs = {"max_workers": 1, "per_grid_cell": True}
+    out = core.utils.reff.calculate_reff_batch([file], [file], [file], **kwargs)
+    expected = core.utils.reff.calculate_reff_batch([reff], [temp], [sad], **kwargs)
+    np.testing.assert_allclose(out.reff, expected.reff)
+    assert list(out.sim.data) == ["sim"]
@@ -0,0 +1,190 @@
+"""Test the time series module."""
+
+import datetime
+
+import numpy as np
+import xarray as xr
+
+import paper1_code as core
+
+
+def _monthly(members: int = 3, years: int = 4) -> list[xr.DataArray]:
+    rng = np.random.default_rng(0)
+    time = xr.cftime_range(
+        start="1850-01-01", periods=12 * years, calendar="noleap", freq="MS"
+    )
+    return [
+        xr.DataArray(rng.normal(size=len(time)), dims="time", coords={"time": time})
+        for _ in range(members)
+    ]
+
+
+def test_window_index() -> None:
+    """Test that window means from the index match the resampled annual means."""
+    arrs = _monthly()
+    index = core.utils.time_series.WindowIndex(arrs)
+    edges = np.asarray(core.utils.time_series.dt2float(arrs[0].time.data[::12]))
+    edges = np.r_[edges, index.x[-1] + 1]
+    out = index.means(edges)
+    for i, arr in enumerate(arrs):
+        expected = core.utils.time_series.weighted_year_avg(arr).data
+        np.testing.assert_allclose(out[i], expected)
+    rolling = index.rolling(12)
+    np.testing.assert_allclose(rolling[:, ::12], out)
+
+
+def test_window_index_nan() -> None:
+    """Test that missing values are left out of the window means."""
+    arr = xr.DataArray(
+        [1.0, np.nan, 3.0, 5.0], dims="time", coords={"time": np.arange(4.0)}
+    )
+    index = core.utils.time_series.WindowIndex(arr)
+    np.testing.assert_allclose(index.mean(0, 3), [2.0])
+    np.testing.assert_allclose(index.mean([0, 2], [2, 4]), [[1.0, 4.0]])
+    assert np.isnan(index.mean(1, 2)[0])
+
+
+def test_quantile_sketch_merge() -> None:
+    """Test that merged sketches agree with the exact quantiles of the full ensemble."""
+    rng = np.random.default_rng(1)
+    members = rng.normal(size=(2000, 6))
+    k = 100
+    sketches = [
+        core.utils.time_series.QuantileSketch(k, seed=i).update(part)
+        for i, part in enumerate(np.array_split(members, 7))
+    ]
+    sketch = sketches[0]
+    for other in sketches[1:]:
+        sketch.merge(other)
+    assert sketch.count == len(members)
+    assert 0 < sketch.rank_error < 1
+    qs = np.array([0.05, 0.5, 0.95])
+    out = sketch.quantile(qs)
+    ranks = (members[None, :, :] <= out[:, None, :]).mean(axis=1)
+    assert np.all(np.abs(ranks - qs[:, None]) <= sketch.rank_error + 1 / len(members))
+
+
+def test_quantile_sketch_exact() -> None:
+    """Test that the sketch is exact before any compaction."""
+    arrs = _monthly(members=5)
+    sketch = core.utils.time_series.QuantileSketch.from_arrays(arrs)
+    _, median = core.utils.time_series.get_median(arrs)
+    np.testing.assert_allclose(sketch.median(), median)
+
+
+def test_float32_mean_flatten() -> None:
+    """Test that float32 mode keeps float32 and stays within float32 rounding."""
+    rng = np.random.default_rng(2)
+    arr = xr.DataArray(
+        (287 + rng.normal(size=(24, 96, 144))).astype(np.float32),
+        dims=["time", "lat", "lon"],
+        coords={"lat": np.linspace(-90, 90, 96), "lon": np.arange(144) * 2.5},
+    )
+    ref = core.utils.time_series.mean_flatten(
+        arr.astype(np.float64), dims=["lat", "lon"]
+    )
+    previous = core.config.PRECISION
+    core.config.PRECISION = "float32"
+    try:
+        out = core.utils.time_series.mean_flatten(arr, dims=["lat", "lon"])
+    finally:
+        core.config.PRECISION = previous
+    assert out.dtype == np.float32
+    np.testing.assert_allclose(out, ref, rtol=np.finfo(np.float32).eps)
+
+
+def test_global_column_sum() -> None:
+    """Test the fused column sum against a global mean followed by a sum over lev."""
+    rng = np.random.default_rng(3)
+    arr = xr.DataArray(
+        rng.uniform(size=(5, 4, 12, 8)),
+        dims=["time", "lev", "lat", "lon"],
+        coords={"lat": np.linspace(-85, 85, 12), "lon": np.arange(8.0)},
+    )
+    ref = core.utils.time_series.mean_flatten(arr, dims=["lat", "lon"]).sum("lev")
+    out = core.utils.time_series.global_column_sum(arr.chunk(time=2))
+    np.testing.assert_allclose(out.compute(), ref)
+
+
+def test_zonal_band_means() -> None:
+    """Test the band means against a weighted mean of the selected latitudes."""
+    rng = np.random.default_rng(4)
+    lat = np.linspace(-90, 90, 19)
+    arr = xr.DataArray(
+        rng.uniform(size=(6, 19, 8)),
+        dims=["time", "lat", "lon"],
+        coords={"lat": lat, "lon": np.arange(8.0)},
+    )
+    arr[0, 3, 2] = np.nan
+    ds = core.utils.time_series.zonal_band_means(arr.chunk(time=2)).compute()
+    np.testing.assert_allclose(ds.zonal_mean, arr.mean("lon"))
+    for band, (south, north) in core.utils.time_series.LATITUDE_BANDS.items():
+        sub = arr.mean("lon").sel(lat=slice(south, north))
+        expected = sub.weighted(np.cos(np.deg2rad(sub.lat))).mean("lat")
+        np.testing.assert_allclose(ds.band_mean.sel(band=band), expected)
+
+
+def test_fit_exp_decay() -> None:
+    """Test that decays with different peaks, lengths and noise are recovered."""
+    rng = np.random.default_rng(5)
+    t = np.arange(0, 10, 1 / 12)
+    tau = np.array([0.5, 1.0, 2.0])
+    peak = t[[2, 6, 12]]
+    y = np.where(t >= peak[:, None], 3 * np.exp(-(t - peak[:, None]) / tau[:, None]), 0)
+    y[2, -24:] = np.nan
+    arr = xr.DataArray(y, dims=["member", "time"], coords={"time": t})
+    out = core.utils.time_series.fit_exp_decay(arr)
+    np.testing.assert_allclose(out.tau, tau)
+    np.testing.assert_allclose(out.amplitude, 3)
+    np.testing.assert_allclose(out.t0, peak)
+    noisy = arr * rng.lognormal(0, 0.05, arr.shape)
+    fit = core.utils.time_series.fit_exp_decay(noisy, window=3, refine=True)
+    np.testing.assert_allclose(fit.tau, tau, rtol=0.1)
+
+
+def test_event_windows() -> None:
+    """Test that the windows match slices of the series and edge events are dropped."""
+    time = xr.cftime_range("0850-01-01", periods=50, freq="D", calendar="noleap")
+    arr = xr.DataArray(
+        np.arange(100.0).reshape(2, 50),
+        dims=["member", "time"],
+        coords={"member": ["a", "b"], "time": time},
+    )
+    events = time[[1, 10, 30, 48]]
+    out = core.utils.time_series.event_windows(arr, events, pre=2, post=5)
+    assert out.dims == ("event", "lag", "member")
+    np.testing.assert_array_equal(out.event, time[[10, 30]])
+    np.testing.assert_array_equal(out.sel(lag=0).T, arr.sel(time=out.event))
+    np.testing.assert_array_equal(out.isel(event=1).T, arr.isel(time=slice(28, 36)))
+
+
+def test_event_series() -> None:
+    """Test that shifted events give the windows and magnitudes of the dense series."""
+    time = xr.cftime_range("0850-01-01", periods=100, freq="D", calendar="noleap")
+    dense = xr.DataArray(np.zeros(100), dims="time", coords={"time": time})
+    dense[[5, 40, 98]] = [1.0, 3.0, 2.0]
+    events = core.utils.time_series.EventSeries.from_dense(dense)
+    xr.testing.assert_equal(events.to_dataarray(time), dense)
+    shifted = events.shift(datetime.timedelta(days=-3))
+    out = shifted.windows(dense, post=5)
+    np.testing.assert_array_equal(out.magnitude, [1.0, 3.0])
+    np.testing.assert_array_equal(out.sel(lag=3), out.magnitude)
+    assert len(shifted.sel(time[0], time[50])) == len(out)
+
+
+def test_weighted_season_means() -> None:
+    """Test that all variables and members match the seasonal mean of each array."""
+    rng = np.random.default_rng(3)
+    time = xr.cftime_range("1850-02-01", periods=40, freq="MS", calendar="360_day")
+    data = rng.normal(size=(2, 3, len(time)))
+    data[0, 1, [4, 5, 6]] = np.nan
+    ds = xr.Dataset(
+        {var: (["eruption", "time"], d) for var, d in zip("ab", data, strict=True)},
+        coords={"time": time},
+    )
+    out = core.utils.time_series.weighted_season_means(ds)
+    for var in "ab":
+        for i in range(3):
+            expected = core.utils.time_series.weighted_season_avg(ds[var][i])
+            np.testing.assert_allclose(out[var][i], expected)
+            np.testing.assert_array_equal(out.time, expected.time)
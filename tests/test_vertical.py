@@ -0,0 +1,190 @@
+"""Test the vertical coordinate module."""
+
+import functools
+import pathlib
+
+import numpy as np
+import pytest
+import xarray as xr
+
+import paper1_code as core
+
+
+def test_stratosphere() -> None:
+    """Test that tropospheric levels are dropped and tropospheric cells masked."""
+    lev = np.asarray(core.utils.vertical.LEV)
+    coords = {"time": np.arange(3.0), "lat": np.linspace(-90, 90, 4)}
+    trop_p = xr.DataArray(
+        np.array([[10_000, 20_000, 20_000, 10_000]] * 3),
+        dims=["time", "lat"],
+        coords=coords,
+    )
+    arr = xr.DataArray(
+        np.ones((3, len(lev), 4)),
+        dims=["time", "lev", "lat"],
+        coords={**coords, "lev": lev},
+        attrs={"units": "mol/mol"},
+    )
+    out = core.utils.vertical.stratosphere(arr, trop_p)
+    assert out.attrs == arr.attrs
+    np.testing.assert_array_equal(out.lev, lev[lev * 100 < trop_p.max().item()])
+    expected = out.lev * 100 < trop_p
+    np.testing.assert_array_equal(out.notnull(), expected.transpose(*out.dims))
+
+
+def test_reff_subset_levels() -> None:
+    """Test that the layer thickness follows the levels that are kept."""
+    lev = np.asarray(core.utils.vertical.LEV)
+    keep = slice(10, 40)
+    temp = xr.DataArray(
+        np.full((2, len(lev)), 250.0)[:, keep],
+        dims=["time", "lev"],
+        coords={"lev": lev[keep]},
+    )
+    reff = core.utils.reff.Reff(temp, temp, temp)
+    expected = 287 / 9.81 * 250 * core.utils.vertical.LOG_P_RATIO[keep]
+    np.testing.assert_allclose(reff.h.isel(time=0), expected)
+
+
+class _Files:
+    """Stand-in for a `FindFiles` selection of already opened files."""
+
+    def __init__(self, arrs: list[xr.DataArray]) -> None:
+        self.arrs = arrs
+
+    def load(self) -> list[xr.DataArray]:
+        return self.arrs
+
+
+def test_vertical_profile() -> None:
+    """Test that the profile sums the modes and keeps only the time window."""
+    rng = np.random.default_rng(0)
+    time = xr.cftime_range("1850-01-01", periods=36, freq="MS", calendar="noleap")
+    coords = {
+        "time": time,
+        "lev": np.asarray(core.utils.vertical.LEV),
+        "lat": np.linspace(-80, 80, 6),
+        "lon": np.arange(4.0),
+    }
+    arrs = [
+        xr.DataArray(
+            rng.uniform(size=(36, 70, 6, 4)),
+            dims=list(coords),
+            coords=coords,
+            name=f"so4_a{i}",
+        )
+        for i in (1, 2, 3)
+    ]
+    profile = core.utils.vertical.VerticalProfile(
+        _Files(arrs),  # type: ignore[arg-type]
+        slice("1850", "1851"),
+    )
+    out = profile.compute(time_chunk=5)
+    total = (arrs[0] + arrs[1] + arrs[2]).sel(time=slice("1850", "1851"))
+    expected = core.utils.time_series.mean_flatten(total, dims=["lat", "lon"])
+    assert out.name == "so4_a1+so4_a2+so4_a3"
+    np.testing.assert_allclose(out, expected)
+
+
+def test_vertical_profile_cache(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the cache is reused, but not for another time window or dims."""
+    monkeypatch.setattr(core.config, "DATA_DIR_OUT", tmp_path)
+    time = xr.cftime_range("1850-01-01", periods=24, freq="MS", calendar="noleap")
+    coords = {"time": time, "lat": np.linspace(-80, 80, 4), "lon": np.arange(3.0)}
+    files = _Files(
+        [
+            xr.DataArray(
+                np.random.default_rng(2).uniform(size=(24, 4, 3)),
+                dims=list(coords),
+                coords=coords,
+                name="so4_a1",
+            )
+        ]
+    )
+    profile = functools.partial(core.utils.vertical.VerticalProfile, files)
+    cached = profile(slice("1850", "1850")).load("profile")
+    files.arrs = [files.arrs[0] * 2]
+    xr.testing.assert_allclose(profile(slice("1850", "1850")).load("profile"), cached)
+    other = profile(slice("1851", "1851")).load("profile")
+    assert other.time.dt.year[0] == time[12].year
+    zonal = profile(slice("1850", "1850"), ["lon"]).load("profile")
+    assert zonal.dims == ("time", "lat")
+
+
+def test_altitude_interpolation() -> None:
+    """Test the altitude of an isothermal column and the interpolation to heights."""
+    lev = np.asarray(core.utils.vertical.LEV)
+    rng = np.random.default_rng(1)
+    temp = xr.DataArray(
+        np.full((4, len(lev), 3), 250.0),
+        dims=["time", "lev", "lat"],
+        coords={"lev": lev},
+    )
+    z = core.utils.vertical.altitude(temp)
+    scale_height = 287 / 9.81 * 250
+    np.testing.assert_allclose(z.isel(time=0, lat=0), scale_height * np.log(1000 / lev))
+    z = z + rng.uniform(-100, 100, z.shape)
+    arr = np.sin(z / 10_000)
+    heights = np.array([-1.0, 500, 12_345, 50_000, 1e6])
+    out = core.utils.vertical.interpolate_to_altitude(arr, z, heights, time_chunk=3)
+    for t in range(4):
+        for j in range(3):
+            col = z.isel(time=t, lat=j).data[::-1]
+            expected = np.interp(heights, col, np.sin(col / 10_000), np.nan, np.nan)
+            np.testing.assert_allclose(out.isel(time=t, lat=j), expected)
+
+
+def _hybrid(hyai: np.ndarray, hybi: np.ndarray) -> xr.Dataset:
+    return xr.Dataset(
+        {"hyai": ("ilev", hyai), "hybi": ("ilev", hybi), "P0": 1e5},
+        coords={"lev": np.asarray(core.utils.vertical.LEV)},
+    )
+
+
+def test_global_burden() -> None:
+    """Test that a well mixed tracer gives its share of the mass of the atmosphere."""
+    lev = np.asarray(core.utils.vertical.LEV)
+    shape = (2, len(lev), 8, 6)
+    arr = xr.DataArray(
+        np.full(shape, 1e-9),
+        dims=["time", "lev", "lat", "lon"],
+        coords={"lev": lev, "lat": np.linspace(-80, 80, 8)},
+    )
+    ps = xr.DataArray(np.full((2, 8, 6), 1e5), dims=["time", "lat", "lon"])
+    sigma = np.asarray(core.utils.vertical.ILEV) / 1000
+    dp = core.utils.vertical.pressure_thickness(_hybrid(0 * sigma, sigma), ps)
+    out = core.utils.vertical.global_burden(arr.chunk(time=1), dp)
+    area = 4 * np.pi * core.utils.vertical.EARTH_RADIUS**2
+    atmosphere = (1e5 - 100 * core.utils.vertical.ILEV[0]) / 9.81 * area
+    np.testing.assert_allclose(out, 1e-9 * atmosphere * 1e-9)
+    strat = core.utils.vertical.stratosphere(arr, xr.full_like(ps, 20_000))
+    assert out[0] > core.utils.vertical.global_burden(strat, dp)[0] > 0
+
+
+def test_pressure_thickness() -> None:
+    """Test the hybrid pressure thickness against the interface pressures."""
+    ilev = np.asarray(core.utils.vertical.ILEV) / 1000
+    # Pure pressure levels above 100 hPa, terrain following below.
+    hybi = np.clip((ilev - 0.1) / 0.9, 0, 1)
+    hyai = ilev - hybi
+    ps = xr.DataArray([90_000.0, 101_000.0], dims="lat")
+    dp = core.utils.vertical.pressure_thickness(_hybrid(hyai, hybi), ps)
+    for j, p_s in enumerate(ps.data):
+        interfaces = hyai * 1e5 + hybi * p_s
+        np.testing.assert_allclose(dp.isel(lat=j), np.diff(interfaces))
+    np.testing.assert_allclose(dp.sum("lev"), ps - hyai[0] * 1e5)
+
+
+def test_stratosphere_time_cut() -> None:
+    """Test that only the tropopause at the time steps of the field sets the levels."""
+    lev = np.asarray(core.utils.vertical.LEV)
+    trop_p = xr.DataArray([10_000.0, 10_000.0, 90_000.0], dims="time")
+    trop_p = trop_p.assign_coords(time=np.arange(3.0))
+    arr = xr.DataArray(
+        np.ones((2, len(lev))), dims=["time", "lev"], coords={"lev": lev}
+    ).assign_coords(time=np.arange(2.0))
+    out = core.utils.vertical.stratosphere(arr, trop_p)
+    np.testing.assert_array_equal(out.lev, lev[lev * 100 < trop_p[0].item()])
+    assert out.notnull().all()